@@ -0,0 +1,437 @@
+"""
+Offline, reproducible benchmark for the TruthLens engines.
+
+Generates synthetic test videos (seeded: same bytes on every run), then runs
+each engine entry point on each video in a fresh process and records load
+time, cold latency (load + first call), warm latency, frames/sec and peak
+RSS. Gemini is replaced by a local stub (Files API server + canned verdict),
+so no network or API key is needed.
+
+    python benchmark_suite.py                                  # full matrix
+    python benchmark_suite.py --quick --engines heatmap neural
+    python benchmark_suite.py --compare bench_results/a.json bench_results/b.json
+
+Results are written to bench_results/<commit>_<timestamp>.json.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import cv2
+import numpy as np
+
+RESULTS_DIR = "bench_results"
+VIDEO_DIR = "bench_videos"
+
+# --- SCENARIOS (resolution x length x face count) ---
+SCENARIOS = [
+    {"name": "240p_3s_1face", "width": 320, "height": 240, "frames": 90, "faces": 1},
+    {"name": "360p_10s_0faces", "width": 640, "height": 360, "frames": 300, "faces": 0},
+    {"name": "360p_10s_1face", "width": 640, "height": 360, "frames": 300, "faces": 1},
+    {"name": "720p_10s_3faces", "width": 1280, "height": 720, "frames": 300, "faces": 3},
+    {"name": "1080p_3s_1face", "width": 1920, "height": 1080, "frames": 90, "faces": 1},
+]
+QUICK_SCENARIOS = ["240p_3s_1face"]
+
+
+def frames_analyzed(engine, total):
+    """Frames an engine actually analyses (for frames/sec), from the engines' frame budgets."""
+    # Imported here, not at module level: workers must set TRUTHLENS_* env vars
+    # (e.g. the Gemini stub URL) before anything loads config
+    from config import HEATMAP_FRAME_BUDGET, NEURAL_FRAME_BUDGET, KEYFRAME_BUDGET
+    budgets = {
+        "heatmap": HEATMAP_FRAME_BUDGET,
+        "neural": NEURAL_FRAME_BUDGET,
+        "local": 10,
+        "gradcam": -(-total // 5),
+        "keyframes": KEYFRAME_BUDGET,
+        "cloud": KEYFRAME_BUDGET,
+    }
+    return min(budgets[engine], total)
+
+
+# --- SYNTHETIC VIDEOS ---
+def synth_video(path, width, height, frames, faces, fps=30, seed=0):
+    """
+    A moving gradient background with sensor-like grain and `faces` cartoon
+    faces (skin ellipse, eyes, talking mouth) drifting across the frame.
+    MJPG/AVI is used because every OpenCV build can write it.
+    """
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open a video writer for {path}")
+
+    xx = np.linspace(0, 255, width, dtype=np.float32)
+    yy = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    background = np.dstack([
+        np.broadcast_to(xx, (height, width)),
+        np.broadcast_to(yy, (height, width)),
+        (np.broadcast_to(xx, (height, width)) + yy) / 2,
+    ]).astype(np.uint8)
+    grain = [rng.integers(-12, 13, (height, width, 3), dtype=np.int16) for _ in range(8)]
+
+    scale = min(width, height)
+    people = [{
+        "x": rng.uniform(0.2, 0.8) * width,
+        "y": rng.uniform(0.3, 0.7) * height,
+        "radius": rng.uniform(0.12, 0.2) * scale,
+        "dx": rng.uniform(-1, 1) * scale / 200,
+        "dy": rng.uniform(-1, 1) * scale / 400,
+        "skin": tuple(int(c) for c in rng.integers(90, 230, 3)),
+        "phase": rng.uniform(0, 2 * np.pi),
+    } for _ in range(faces)]
+
+    try:
+        for i in range(frames):
+            frame = np.roll(background, i * 2, axis=1).astype(np.int16)
+            frame = np.clip(frame + grain[i % len(grain)], 0, 255).astype(np.uint8)
+            for p in people:
+                x = int((p["x"] + p["dx"] * i) % width)
+                y = int(np.clip(p["y"] + p["dy"] * i, p["radius"], height - p["radius"]))
+                r = int(p["radius"])
+                cv2.ellipse(frame, (x, y), (int(r * 0.8), r), 0, 0, 360, p["skin"], -1)
+                for side in (-1, 1):
+                    eye = (x + side * r // 3, y - r // 4)
+                    cv2.circle(frame, eye, max(2, r // 8), (255, 255, 255), -1)
+                    cv2.circle(frame, eye, max(1, r // 16), (40, 30, 20), -1)
+                mouth = max(1, int(r / 8 * (1 + np.sin(p["phase"] + i / 3))))
+                cv2.ellipse(frame, (x, y + r // 2), (r // 3, mouth), 0, 0, 360, (60, 40, 150), -1)
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def scenario_video(scenario, video_dir=VIDEO_DIR):
+    """Generates the scenario's video once; later runs reuse the file."""
+    os.makedirs(video_dir, exist_ok=True)
+    path = os.path.join(video_dir, f"{scenario['name']}.avi")
+    if not os.path.exists(path):
+        print(f"[Bench] Generating {path}...")
+        synth_video(path + ".tmp.avi", scenario["width"], scenario["height"], scenario["frames"], scenario["faces"])
+        os.replace(path + ".tmp.avi", path)
+    return path
+
+
+# --- GEMINI STUB ---
+class _StubFilesHandler(BaseHTTPRequestHandler):
+    """Just enough of the Files API resumable upload protocol for GeminiFilesClient."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        files = self.server.files
+        if self.headers.get("X-Goog-Upload-Command") == "start":
+            file_id = uuid.uuid4().hex[:12]
+            files[file_id] = {
+                "name": f"files/{file_id}",
+                "displayName": json.loads(body)["file"]["display_name"],
+                "mimeType": self.headers["X-Goog-Upload-Header-Content-Type"],
+            }
+            host, port = self.server.server_address
+            return self._send({}, {"X-Goog-Upload-URL": f"http://{host}:{port}/resumable/{file_id}"})
+
+        file = files[self.path.rsplit("/", 1)[-1]]
+        file.update(sizeBytes=str(len(body)), uri=f"stub://{file['name']}", state="ACTIVE")
+        self._send({"file": file})
+
+    def do_GET(self):
+        self._send(self.server.files[self.path.rsplit("/", 1)[-1]])
+
+
+class StubGeminiServer:
+    """Local stand-in for the Gemini Files API (point TRUTHLENS_GEMINI_API_BASE at .url)."""
+
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StubFilesHandler)
+        self.httpd.files = {}
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, name="gemini-stub", daemon=True).start()
+
+
+class StubGenerativeModel:
+    """Replaces genai.GenerativeModel: answers instantly with a fixed, valid verdict."""
+
+    class _Response:
+        text = json.dumps({
+            "confidence_score": 50, "deepfake_score": 50, "verdict_title": "BENCHMARK STUB",
+            "visual_evidence": [], "audio_evidence": [], "fact_check_analysis": "Stubbed.",
+        })
+
+    def generate_content(self, contents, generation_config=None):
+        return self._Response()
+
+
+# --- ENGINES (each setup returns run(video_path) -> score) ---
+def _remove(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def _setup_heatmap(options):
+    import heatmap_engine
+    if heatmap_engine.load_model() is None:
+        raise RuntimeError("ResNet18 could not be loaded.")
+
+    def run(path):
+        result = heatmap_engine.process_video_heatmap(path, output_name=f"bench_{os.getpid()}")
+        _remove(result["video_path"])
+        return result["deepfake_score"]
+    return run
+
+
+def _setup_neural(options):
+    import local_engine1
+    if local_engine1.load_classifier() is None:
+        raise RuntimeError("Neural classifier could not be loaded.")
+    return lambda path: local_engine1.analyze_video_neural(path)["deepfake_score"]
+
+
+def _setup_local(options):
+    from local_engine import LocalDeepfakeDetector
+    detector = LocalDeepfakeDetector(model_path=options.local_weights)
+    if not detector.model:
+        raise RuntimeError(f"No local model at {options.local_weights}.")
+    return lambda path: detector.detect(path).get("confidence")
+
+
+def _setup_gradcam(options):
+    from gradcam_engine.engine import GradCAMDeepfakeDetector
+    detector = GradCAMDeepfakeDetector(model_path=options.gradcam_weights)
+
+    def run(path):
+        output = os.path.join(tempfile.gettempdir(), f"bench_gradcam_{os.getpid()}.mp4")
+        try:
+            score = detector.process_video(path, output)[0]
+        finally:
+            _remove(output)
+        return score
+    return run
+
+
+def _import_main(stub):
+    # main.py reads these at import time; load_dotenv() never overrides them
+    os.environ["GOOGLE_API_KEY"] = "benchmark"
+    os.environ["TRUTHLENS_GEMINI_API_BASE"] = stub.url if stub else "http://127.0.0.1:9"
+    os.environ["TRUTHLENS_WARMUP"] = "0"
+    import main
+    main.models.register("gemini", StubGenerativeModel)
+    return main
+
+
+def _setup_keyframes(options):
+    main = _import_main(None)
+    return lambda path: len(main.extract_hd_frames(path))
+
+
+def _setup_cloud(options):
+    main = _import_main(StubGeminiServer())
+    return lambda path: main.analyze_gemini(path, os.path.basename(path))["deepfake_score"]
+
+
+ENGINES = {
+    "heatmap": _setup_heatmap,
+    "neural": _setup_neural,
+    "local": _setup_local,
+    "gradcam": _setup_gradcam,
+    "keyframes": _setup_keyframes,
+    "cloud": _setup_cloud,
+}
+
+
+# --- WORKER (one engine x one video, in a fresh process) ---
+def peak_rss_mb():
+    try:
+        import psutil
+        peak = getattr(psutil.Process().memory_info(), "peak_wset", None)  # Windows only
+        if peak:
+            return round(peak / 2 ** 20, 1)
+    except ImportError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def run_worker(options):
+    start = time.perf_counter()
+    run = ENGINES[options.worker](options)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    score = run(options.video)
+    first_seconds = time.perf_counter() - start
+
+    warm = []
+    for _ in range(options.repeats):
+        start = time.perf_counter()
+        run(options.video)
+        warm.append(time.perf_counter() - start)
+
+    result = {
+        "load_seconds": round(load_seconds, 4),
+        "first_call_seconds": round(first_seconds, 4),
+        "cold_seconds": round(load_seconds + first_seconds, 4),
+        "warm_seconds": [round(s, 4) for s in warm],
+        "peak_rss_mb": peak_rss_mb(),
+        "score": score,
+    }
+    with open(options.result, "w") as f:
+        json.dump(result, f)
+
+
+def bench(engine, scenario, video, options):
+    """Runs one worker process and returns its result row (with "error" on failure)."""
+    row = {"engine": engine, "scenario": scenario["name"], **{k: scenario[k] for k in ("width", "height", "frames", "faces")}}
+    fd, result_path = tempfile.mkstemp(suffix=".json", prefix="bench_")
+    os.close(fd)
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker", engine, "--video", video,
+        "--result", result_path, "--repeats", str(options.repeats),
+        "--local-weights", options.local_weights, "--gradcam-weights", options.gradcam_weights,
+    ]
+    try:
+        proc = subprocess.run(command, capture_output=True, text=True, timeout=options.timeout)
+        if proc.returncode != 0:
+            output = (proc.stderr or proc.stdout).strip().splitlines()
+            row["error"] = output[-1] if output else f"Exit code {proc.returncode}"
+            return row
+        with open(result_path) as f:
+            row.update(json.load(f))
+    except subprocess.TimeoutExpired:
+        row["error"] = f"Timed out after {options.timeout}s"
+        return row
+    finally:
+        _remove(result_path)
+
+    warm = row["warm_seconds"] or [row["first_call_seconds"]]
+    row["warm_median_seconds"] = round(statistics.median(warm), 4)
+    row["frames_analyzed"] = frames_analyzed(engine, scenario["frames"])
+    row["fps"] = round(row["frames_analyzed"] / row["warm_median_seconds"], 2) if row["warm_median_seconds"] else None
+    return row
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    info = {
+        "commit": commit or None,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["cuda"] = torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+# --- COMPARE ---
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {(r["engine"], r["scenario"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+
+    print(f"{'engine':<10} {'scenario':<18} {'old warm':>9} {'new warm':>9} {'change':>8} {'old RSS':>8} {'new RSS':>8}")
+    for row in new:
+        before = old.get((row["engine"], row["scenario"]))
+        if not before or "error" in row or "error" in before:
+            print(f"{row['engine']:<10} {row['scenario']:<18} {'(missing or failed)':>29}")
+            continue
+        a, b = before["warm_median_seconds"], row["warm_median_seconds"]
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{row['engine']:<10} {row['scenario']:<18} {a:>8.3f}s {b:>8.3f}s {change:>8} "
+              f"{before.get('peak_rss_mb') or 0:>7.0f}M {row.get('peak_rss_mb') or 0:>7.0f}M")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TruthLens offline engine benchmark")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument("--scenarios", nargs="+", choices=[s["name"] for s in SCENARIOS])
+    parser.add_argument("--quick", action="store_true", help=f"Only {', '.join(QUICK_SCENARIOS)}, one warm run")
+    parser.add_argument("--repeats", type=int, default=3, help="Warm runs per engine and video")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds per engine and video")
+    parser.add_argument("--output", help="Results file (default: bench_results/<commit>_<timestamp>.json)")
+    parser.add_argument("--video-dir", default=VIDEO_DIR)
+    parser.add_argument("--local-weights", default="models/best_model.pth")
+    parser.add_argument("--gradcam-weights", default="models/best_resnet18.pth")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two results files")
+    # Internal: run one engine on one video and write its measurements to --result
+    parser.add_argument("--worker", choices=list(ENGINES), help=argparse.SUPPRESS)
+    parser.add_argument("--video", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    options = parser.parse_args()
+
+    if options.worker:
+        return run_worker(options)
+    if options.compare:
+        return compare(*options.compare)
+
+    names = options.scenarios or (QUICK_SCENARIOS if options.quick else [s["name"] for s in SCENARIOS])
+    if options.quick:
+        options.repeats = min(options.repeats, 1)
+    scenarios = [s for s in SCENARIOS if s["name"] in names]
+
+    report = {"environment": environment(), "repeats": options.repeats, "results": []}
+    for scenario in scenarios:
+        video = scenario_video(scenario, options.video_dir)
+        for engine in options.engines:
+            print(f"[Bench] {engine} on {scenario['name']}...")
+            row = bench(engine, scenario, video, options)
+            report["results"].append(row)
+            if "error" in row:
+                print(f"    [FAIL] {row['error']}")
+            else:
+                print(f"    cold {row['cold_seconds']:.2f}s | warm {row['warm_median_seconds']:.2f}s | "
+                      f"{row['fps']} fps | peak RSS {row['peak_rss_mb']} MB")
+
+    output = options.output or os.path.join(
+        RESULTS_DIR, f"{report['environment']['commit'] or 'nogit'}_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"[Bench] Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
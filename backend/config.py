@@ -0,0 +1,167 @@
+import os
+import tempfile
+from dotenv import load_dotenv
+
+# Every knob can be overridden from the environment / .env file.
+load_dotenv()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _env_weights(name, default, known):
+    """"cloud=0.6,heatmap=0.3,neural=0.1" -> {engine: weight}, normalized to sum to 1 (unknown engines dropped)."""
+    try:
+        pairs = (item.split("=") for item in os.getenv(name, "").split(",") if item.strip())
+        weights = {key.strip(): float(value) for key, value in pairs}
+    except ValueError:
+        return default
+    weights = {key: value for key, value in weights.items() if key in known}
+    total = sum(weights.values())
+    if total <= 0:
+        if os.getenv(name):
+            print(f"[Config] {name} names no known engine ({', '.join(known)}); using the default.")
+        return default
+    return {key: value / total for key, value in weights.items()}
+
+
+def _env_tiers(name, default, known):
+    """
+    "heatmap,neural;cloud" -> [["heatmap", "neural"], ["cloud"]] (cheapest tier first).
+    Engines not in `known` are dropped; if no tier is left, the default is used.
+    """
+    value = os.getenv(name, "")
+    tiers = [[e.strip() for e in tier.split(",") if e.strip() in known] for tier in value.split(";")]
+    tiers = [tier for tier in tiers if tier]
+    if not tiers:
+        if value:
+            print(f"[Config] {name} names no weighted engine ({', '.join(known)}); using the default.")
+        tiers = [[e for e in tier if e in known] for tier in default]
+        tiers = [tier for tier in tiers if tier]
+    return tiers
+
+
+def _env_band(name, default):
+    """"35,65" -> (35.0, 65.0)."""
+    try:
+        low, high = (float(v) for v in os.getenv(name, "").split(","))
+        return (low, high) if low <= high else default
+    except ValueError:
+        return default
+
+
+# --- ENSEMBLE EXECUTION ---
+ENGINE_WORKERS = _env_int("TRUTHLENS_ENGINE_WORKERS", 2)        # Local engine thread pool
+CLOUD_WORKERS = _env_int("TRUTHLENS_CLOUD_WORKERS", 4)          # Gemini upload/poll threads
+HEATMAP_TIMEOUT = _env_float("TRUTHLENS_HEATMAP_TIMEOUT", 300.0)  # Seconds
+NEURAL_TIMEOUT = _env_float("TRUTHLENS_NEURAL_TIMEOUT", 120.0)
+CLOUD_TIMEOUT = _env_float("TRUTHLENS_CLOUD_TIMEOUT", 600.0)
+FALLBACK_SCORE = 50.0                                           # Score used when an engine fails
+
+# --- ENSEMBLE POLICY ---
+ENSEMBLE_ENGINES = ("cloud", "heatmap", "neural")
+ENSEMBLE_WEIGHTS = _env_weights("TRUTHLENS_ENSEMBLE_WEIGHTS", {"cloud": 0.6, "heatmap": 0.3, "neural": 0.1}, ENSEMBLE_ENGINES)
+ENSEMBLE_POLICY = os.getenv("TRUTHLENS_ENSEMBLE_POLICY", "cascade")   # cascade (tier by tier) / parallel (all at once)
+CASCADE_TIERS = _env_tiers("TRUTHLENS_CASCADE_TIERS", [["heatmap", "neural"], ["cloud"]], ENSEMBLE_WEIGHTS)  # Cheapest first
+CASCADE_UNCERTAIN_BAND = _env_band("TRUTHLENS_CASCADE_BAND", (30.0, 70.0))  # Escalate while the score is inside
+
+# --- EARLY STOPPING (sequential decisions, within and across engines) ---
+EARLY_STOP = os.getenv("TRUTHLENS_EARLY_STOP", "0") == "1"          # Default for requests that don't say
+EARLY_STOP_THRESHOLD = _env_float("TRUTHLENS_EARLY_STOP_THRESHOLD", 50.0)  # FAKE above, REAL below
+EARLY_STOP_Z = _env_float("TRUTHLENS_EARLY_STOP_Z", 2.576)          # Confidence interval width (2.576 = 99%)
+EARLY_STOP_MIN_FRAMES = _env_int("TRUTHLENS_EARLY_STOP_MIN_FRAMES", 8)  # Never decide on fewer frames
+EARLY_STOP_MIN_STD = _env_float("TRUTHLENS_EARLY_STOP_MIN_STD", 5.0)    # Score std floor (0-100 scale)
+
+# --- STREAMING PIPELINE (decode -> preprocess -> inference -> write) ---
+PIPELINE_WORKERS = max(1, _env_int("TRUTHLENS_PIPELINE_WORKERS", min(4, os.cpu_count() or 1)))  # Preprocess threads
+PIPELINE_QUEUE_SIZE = max(1, _env_int("TRUTHLENS_PIPELINE_QUEUE_SIZE", 32))  # Frames buffered between stages
+
+# --- FRAME SAMPLING (fixed per-engine budgets spread over the whole video) ---
+HEATMAP_FRAME_BUDGET = max(1, _env_int("TRUTHLENS_HEATMAP_FRAME_BUDGET", 150))  # Frames per video, heatmap engine
+NEURAL_FRAME_BUDGET = max(1, _env_int("TRUTHLENS_NEURAL_FRAME_BUDGET", 9))      # ...neural core
+KEYFRAME_BUDGET = max(1, _env_int("TRUTHLENS_KEYFRAME_BUDGET", 5))              # ...Gemini HD keyframes
+SAMPLER_CUT_THRESHOLD = _env_float("TRUTHLENS_SAMPLER_CUT_THRESHOLD", 0.35)  # Thumbnail change (0-1) counted as a scene cut
+SAMPLER_MOTION_GAIN = _env_float("TRUTHLENS_SAMPLER_MOTION_GAIN", 4.0)       # How much change tightens the sampling pace
+SAMPLER_ADAPTIVE_SHARE = min(1.0, max(0.0, _env_float("TRUTHLENS_SAMPLER_ADAPTIVE_SHARE", 0.5)))  # Budget extra samples may use
+SAMPLER_PROBES_PER_SAMPLE = max(1, _env_int("TRUTHLENS_SAMPLER_PROBES_PER_SAMPLE", 4))  # Change probes per budgeted frame
+
+# --- HEATMAP ENGINE ---
+HEATMAP_BATCH_SIZE = max(1, _env_int("TRUTHLENS_HEATMAP_BATCH_SIZE", 8))  # Frames per Grad-CAM pass
+
+# --- HEATMAP OUTPUT VIDEO ---
+OUTPUT_DIR = "generated"                                                     # Served at /generated
+OUTPUT_MAX_AGE = _env_int("TRUTHLENS_OUTPUT_MAX_AGE", 24 * 3600)             # Seconds before the janitor deletes a file
+OUTPUT_MAX_MB = _env_int("TRUTHLENS_OUTPUT_MAX_MB", 1024)                    # Total size budget for generated/
+OUTPUT_SWEEP_INTERVAL = _env_int("TRUTHLENS_OUTPUT_SWEEP_INTERVAL", 600)     # Seconds between janitor sweeps
+OUTPUT_HTTP_MAX_AGE = _env_int("TRUTHLENS_OUTPUT_HTTP_MAX_AGE", 3600)        # Cache-Control max-age for served files
+HEATMAP_OUTPUT_PROFILE = os.getenv("TRUTHLENS_HEATMAP_PROFILE", "preview")  # preview / full
+HEATMAP_CODEC = os.getenv("TRUTHLENS_HEATMAP_CODEC", "auto")                # auto / avc1 / vp09 / mp4v
+PREVIEW_MAX_SIDE = _env_int("TRUTHLENS_PREVIEW_MAX_SIDE", 640)               # Longest side in px
+PREVIEW_FPS = _env_float("TRUTHLENS_PREVIEW_FPS", 15.0)
+OUTPUT_PROFILES = {
+    # Small, fast, browser-friendly preview (the frontend only plays it back)
+    "preview": {"max_side": PREVIEW_MAX_SIDE, "fps": PREVIEW_FPS, "codec": HEATMAP_CODEC},
+    # Source resolution and frame rate (0 = keep)
+    "full": {"max_side": 0, "fps": 0, "codec": HEATMAP_CODEC},
+}
+
+# --- RESULT CACHE ---
+MODEL_VERSION = os.getenv("TRUTHLENS_MODEL_VERSION", "2025.2")   # Bump to invalidate cached verdicts
+CACHE_DIR = os.getenv("TRUTHLENS_CACHE_DIR", "cache")
+CACHE_MEMORY_ENTRIES = _env_int("TRUTHLENS_CACHE_MEMORY_ENTRIES", 256)
+CACHE_TTL = _env_float("TRUTHLENS_CACHE_TTL", 7 * 24 * 3600.0)     # Seconds
+CACHE_MAX_DISK_MB = _env_int("TRUTHLENS_CACHE_MAX_DISK_MB", 256)
+
+# --- ASYNC JOBS ---
+JOB_QUEUE_SIZE = _env_int("TRUTHLENS_JOB_QUEUE_SIZE", 16)        # Pending jobs before 503
+JOB_WORKERS = _env_int("TRUTHLENS_JOB_WORKERS", 2)               # Jobs analysed at once
+JOB_RESULT_TTL = _env_float("TRUTHLENS_JOB_RESULT_TTL", 3600.0)  # Seconds a finished job stays pollable
+
+# --- SHARED MODEL SERVER (python model_server.py) ---
+MODEL_SERVER_ADDRESS = os.getenv("TRUTHLENS_MODEL_SERVER", "")          # host:port or socket path; "" = load models in-process
+MODEL_SERVER_AUTHKEY = os.getenv("TRUTHLENS_MODEL_SERVER_AUTHKEY", "").encode("utf-8")  # Shared secret, required (no default)
+
+# --- MICRO-BATCHING (frames from concurrent requests share forward passes) ---
+MICROBATCH_MAX_WAIT_MS = _env_float("TRUTHLENS_MICROBATCH_MAX_WAIT_MS", 5.0)  # Wait for more requests to join a batch
+HEATMAP_MICROBATCH_SIZE = max(1, _env_int("TRUTHLENS_HEATMAP_MICROBATCH_SIZE", 32))  # ResNet18 frames per pass
+NEURAL_MICROBATCH_SIZE = max(1, _env_int("TRUTHLENS_NEURAL_MICROBATCH_SIZE", 32))    # ViT frames per pass
+
+# --- MODEL LOADING ---
+WARMUP_MODELS = os.getenv("TRUTHLENS_WARMUP", "1") == "1"       # Load engines in the background at startup
+
+# --- UPLOADS ---
+SCRATCH_DIR = os.getenv("TRUTHLENS_SCRATCH_DIR", tempfile.gettempdir())  # Where large uploads spill to
+UPLOAD_SPOOL_MAX_MB = _env_int("TRUTHLENS_UPLOAD_SPOOL_MAX_MB", 32)     # Uploads up to this stay in memory
+
+# --- NEURAL CORE ---
+NEURAL_BATCH_SIZE = max(1, _env_int("TRUTHLENS_NEURAL_BATCH_SIZE", 16))  # Frames per ViT forward pass
+NEURAL_EARLY_STOP_BATCH_SIZE = max(1, _env_int("TRUTHLENS_NEURAL_EARLY_STOP_BATCH_SIZE", 4))  # Smaller passes so early stop can check between them
+NEURAL_AUTOCAST = os.getenv("TRUTHLENS_NEURAL_AUTOCAST", "auto")          # auto / fp16 / bf16 / off
+
+# --- LOCAL DETECTOR (MTCNN + EfficientNet/LSTM) ---
+LOCAL_FACE_BATCH_SIZE = max(1, _env_int("TRUTHLENS_LOCAL_FACE_BATCH_SIZE", 32))  # Face crops per CNN pass
+LOCAL_DETECT_MODE = os.getenv("TRUTHLENS_LOCAL_DETECT_MODE", "track")  # track (face sequences) / frame (one crop per call)
+LOCAL_TRACK_IOU = _env_float("TRUTHLENS_LOCAL_TRACK_IOU", 0.3)          # Min box overlap to link a face across frames
+LOCAL_TRACK_MAX_GAP = _env_int("TRUTHLENS_LOCAL_TRACK_MAX_GAP", 2)      # Sampled frames a face may go missing
+LOCAL_SEQ_LEN = max(1, _env_int("TRUTHLENS_LOCAL_SEQ_LEN", 8))          # Frames per LSTM sequence
+LOCAL_SEQ_STRIDE = max(1, _env_int("TRUTHLENS_LOCAL_SEQ_STRIDE", 4))    # Step between overlapping sequences
+
+# --- GEMINI KEYFRAMES ---
+KEYFRAME_JPEG_QUALITY = _env_int("TRUTHLENS_KEYFRAME_JPEG_QUALITY", 95)  # In-memory JPEG quality
+KEYFRAME_MAX_SIDE = _env_int("TRUTHLENS_KEYFRAME_MAX_SIDE", 1920)        # Longest side in px (0 = no cap)
+
+# --- GEMINI FILES API ---
+GEMINI_API_BASE = os.getenv("TRUTHLENS_GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+GEMINI_UPLOAD_WORKERS = _env_int("TRUTHLENS_GEMINI_UPLOAD_WORKERS", 6)            # Parallel uploads (video + 5 frames)
+GEMINI_PROCESSING_DEADLINE = _env_float("TRUTHLENS_GEMINI_PROCESSING_DEADLINE", 300.0)  # Seconds
@@ -0,0 +1,102 @@
+import math
+
+from config import EARLY_STOP_THRESHOLD, EARLY_STOP_Z, EARLY_STOP_MIN_FRAMES, EARLY_STOP_MIN_STD
+
+
+class EngineCancelled(Exception):
+    """Raised inside an engine once the ensemble no longer needs its result."""
+
+
+def check_cancelled(cancel, engine):
+    """Raises EngineCancelled if the optional threading.Event `cancel` is set."""
+    if cancel is not None and cancel.is_set():
+        raise EngineCancelled(f"{engine} engine no longer needed.")
+
+
+# --- WITHIN AN ENGINE ---
+class SequentialVerdict:
+    """
+    Running mean of per-frame scores (0-100) with a normal-approximation
+    confidence interval. decided() returns "FAKE" / "REAL" as soon as the whole
+    interval lies on one side of `threshold`, else None.
+
+    The standard deviation is never taken below `min_std`, so a handful of
+    near-identical frames can't fake certainty, and nothing is decided before
+    `min_samples` frames.
+    """
+
+    def __init__(self, threshold=EARLY_STOP_THRESHOLD, z=EARLY_STOP_Z,
+                 min_samples=EARLY_STOP_MIN_FRAMES, min_std=EARLY_STOP_MIN_STD):
+        self.threshold = threshold
+        self.z = z
+        self.min_samples = max(2, min_samples)
+        self.min_std = min_std
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, score):
+        # Welford's online mean/variance
+        self.n += 1
+        delta = score - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (score - self.mean)
+
+    def extend(self, scores):
+        for score in scores:
+            self.add(score)
+
+    def interval(self):
+        if self.n < 2:
+            return 0.0, 100.0
+        std = max(math.sqrt(self._m2 / (self.n - 1)), self.min_std)
+        half = self.z * std / math.sqrt(self.n)
+        return self.mean - half, self.mean + half
+
+    def decided(self):
+        if self.n < self.min_samples:
+            return None
+        low, high = self.interval()
+        if low > self.threshold:
+            return "FAKE"
+        if high < self.threshold:
+            return "REAL"
+        return None
+
+
+def stop_condition(verdict=None, cancel=None, score=None):
+    """
+    Builds a StreamPipeline `until` callback: stop once `verdict` (fed with
+    score(result) for every result) is decided, or once `cancel` is set.
+    """
+    def until(batch_results):
+        if cancel is not None and cancel.is_set():
+            return True
+        if verdict is None:
+            return False
+        verdict.extend(score(r) if score else r for r in batch_results)
+        return verdict.decided() is not None
+    return until
+
+
+# --- ACROSS ENGINES ---
+def settled_verdict(scores, weights, threshold=EARLY_STOP_THRESHOLD):
+    """
+    Whether the weighted ensemble verdict is already fixed by the engines that
+    finished. `scores`: {engine: score} of finished engines; `weights`:
+    {engine: weight} of all engines (summing to 1). Unfinished engines could
+    still add anything between 0 and 100 x their weight, so the verdict is
+    settled only if that whole range stays on one side of `threshold`.
+
+    Returns (verdict or None, score renormalized over the finished engines).
+    """
+    known = sum(weights[name] * score for name, score in scores.items())
+    finished = sum(weights[name] for name in scores)
+    remaining = sum(weight for name, weight in weights.items() if name not in scores)
+    score = known / finished if finished else None
+
+    if known > threshold:
+        return "FAKE", score
+    if known + 100 * remaining < threshold:
+        return "REAL", score
+    return None, score
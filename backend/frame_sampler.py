@@ -0,0 +1,139 @@
+import cv2
+import numpy as np
+
+from config import (
+    SAMPLER_CUT_THRESHOLD, SAMPLER_MOTION_GAIN, SAMPLER_ADAPTIVE_SHARE, SAMPLER_PROBES_PER_SAMPLE,
+)
+
+THUMB_SIZE = (64, 36)      # Change metrics run on tiny grayscale thumbnails
+HIST_BINS = 32
+
+
+# --- CHANGE METRICS ---
+def thumbnail(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return cv2.resize(gray, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def frame_change(previous, current):
+    """
+    0..1 change between two thumbnails: the mean of the gray-histogram
+    distance (catches scene cuts, ignores motion) and the mean absolute pixel
+    difference (catches motion inside a shot).
+    """
+    hist_a = cv2.calcHist([previous], [0], None, [HIST_BINS], [0, 256])
+    hist_b = cv2.calcHist([current], [0], None, [HIST_BINS], [0, 256])
+    hist = cv2.compareHist(hist_a, hist_b, cv2.HISTCMP_BHATTACHARYYA)
+    diff = float(np.mean(cv2.absdiff(previous, current))) / 255
+    return min(1.0, 0.5 * (hist + diff))
+
+
+# --- SAMPLER ---
+class AdaptiveSampler:
+    """
+    Spreads a budget of frames over the WHOLE video in one sequential pass.
+
+    Samples are paced evenly over what is left of the video (frames left /
+    budget left). Every `probe_step`-th frame is compared with the previous
+    probe on a thumbnail; a scene cut is sampled right away, and the pace
+    tightens while the picture keeps changing (the change decays over the
+    following probes, so the shot after a cut gets extra samples). Extra
+    samples only come out of `adaptive_share` of the budget: the rest always
+    stays spread over the remaining duration.
+
+    Feed it every frame index in order: wants(i) says whether frame i has to
+    be retrieve()'d at all, offer(i, frame) whether it is kept.
+    """
+
+    def __init__(self, total_frames, budget, probe_step=None, cut_threshold=SAMPLER_CUT_THRESHOLD,
+                 motion_gain=SAMPLER_MOTION_GAIN, adaptive_share=SAMPLER_ADAPTIVE_SHARE, decay=0.6):
+        # Unknown length: fall back to the first `budget` frames
+        self.total = total_frames if total_frames > 0 else budget
+        self.budget = min(budget, self.total)
+        self.remaining = self.budget
+        self.probe_step = probe_step or max(1, self.total // max(1, budget * SAMPLER_PROBES_PER_SAMPLE))
+        self.cut_threshold = cut_threshold
+        self.motion_gain = motion_gain
+        self.adaptive_share = adaptive_share
+        self.decay = decay
+
+        self.indices = []     # Kept frame indices, in order
+        self.cuts = []        # Probe indices where a scene cut was detected
+        self._activity = 0.0
+        self._thumb = None
+        # First sample half a stride in, so the samples are centred in their slots
+        self._next_due = (self.total / self.budget) // 2 if self.budget else float("inf")
+
+    @property
+    def done(self):
+        return self.remaining <= 0
+
+    def wants(self, index):
+        return not self.done and (index >= self._next_due or index % self.probe_step == 0)
+
+    def offer(self, index, frame):
+        cut = False
+        if index % self.probe_step == 0:
+            thumb = thumbnail(frame)
+            if self._thumb is not None:
+                change = frame_change(self._thumb, thumb)
+                self._activity = max(change, self._activity * self.decay)
+                cut = change >= self.cut_threshold
+                if cut:
+                    self.cuts.append(index)
+            self._thumb = thumb
+
+        if index >= self._next_due or (cut and self._spare(index)):
+            self.indices.append(index)
+            self.remaining -= 1
+            self._schedule(index)
+            return True
+        return False
+
+    def _spare(self, index):
+        """Whether an extra sample still leaves the uniform share for the rest of the video."""
+        reserved = (1 - self.adaptive_share) * self.budget * (self.total - index - 1) / self.total
+        return self.remaining - 1 >= reserved
+
+    def _schedule(self, index):
+        left = self.total - index - 1
+        if self.remaining <= 0 or left <= 0:
+            self._next_due = float("inf")
+            return
+        # Half a slot is left after the last sample, as before the first one
+        stride = left / (self.remaining + 0.5)
+        if self._spare(index):
+            stride /= 1 + self.motion_gain * self._activity
+        self._next_due = index + max(1.0, stride)
+
+    def frames(self, cap):
+        """Yields the kept BGR frames of an opened cv2.VideoCapture (read from its current position)."""
+        index = 0
+        while not self.done and cap.grab():
+            # grab() demuxes/decodes without the BGR conversion + copy
+            if self.wants(index):
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                if self.offer(index, frame):
+                    yield frame
+            index += 1
+
+
+def sampled_fps(fps, total_frames, budget):
+    """Average frame rate of `budget` frames spread over the video (for writing them back out)."""
+    if total_frames <= 0 or budget >= total_frames:
+        return fps
+    return fps * budget / total_frames
+
+
+def sample_frames(video_path, budget, **kwargs):
+    """Yields up to `budget` BGR frames of video_path, picked by an AdaptiveSampler."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        if not cap.isOpened():
+            return
+        sampler = AdaptiveSampler(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), budget, **kwargs)
+        yield from sampler.frames(cap)
+    finally:
+        cap.release()
@@ -0,0 +1,178 @@
+import cv2
+
+from config import (
+    HEATMAP_FRAME_BUDGET, NEURAL_FRAME_BUDGET, KEYFRAME_BUDGET, KEYFRAME_MAX_SIDE,
+    OUTPUT_PROFILES, HEATMAP_OUTPUT_PROFILE,
+)
+from frame_sampler import AdaptiveSampler, sampled_fps
+from telemetry import span
+
+# --- FRAME PLANS (How many frames each engine reads, spread over the whole video) ---
+PLAN_BUDGETS = {"heatmap": HEATMAP_FRAME_BUDGET, "neural": NEURAL_FRAME_BUDGET, "keyframes": KEYFRAME_BUDGET}
+# Largest side (px) each engine uses; frames are stored no bigger than that (0 = source size).
+# The heatmap is only blended/written at its output size; the ViT gets the source frame.
+PLAN_MAX_SIDES = {
+    "heatmap": OUTPUT_PROFILES[HEATMAP_OUTPUT_PROFILE]["max_side"],
+    "neural": 0,
+    "keyframes": KEYFRAME_MAX_SIDE,
+}
+
+
+def downscale(frame, max_side=0):
+    """Shrinks a frame so its longest side is <= max_side (0 = keep)."""
+    if max_side:
+        height, width = frame.shape[:2]
+        scale = max_side / max(height, width)
+        if scale < 1:
+            return cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def larger_side(a, b):
+    """The larger of two max_side limits (0 = unlimited wins)."""
+    return 0 if not a or not b else max(a, b)
+
+
+class FrameSource:
+    """
+    Decodes a video ONCE and hands every engine the frames it asked for.
+    Engines register a named plan (a list of frame indices, or a frame budget
+    picked by an AdaptiveSampler), then decode() makes a single sequential
+    pass: frames nobody wants are only grab()'ed, wanted frames are
+    retrieve()'d once and shared between plans.
+
+    Each plan may cap the frame size (max_side); a shared frame is stored at
+    the largest size any of its plans asks for. release_plan() drops a plan's
+    frames as soon as its engine is done with them.
+    """
+
+    def __init__(self, video_path):
+        self.video_path = video_path
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video file: {video_path}")
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        self._plans = {}
+        self._samplers = {}   # Sampled plans not decoded yet
+        self._sides = {}      # max_side per plan
+        self._frames = {}
+        self._frame_sides = {}  # max_side each stored frame was kept at
+        self._decoded = False
+
+    @property
+    def duration(self):
+        return self.total_frames / self.fps if self.fps > 0 else 0
+
+    def request(self, name, indices, max_side=0):
+        """Register the frame indices an engine needs under `name`."""
+        self._plans[name] = [i for i in indices if i >= 0]
+        self._sides[name] = max_side
+        self._decoded = False
+        return self
+
+    def request_sampled(self, name, budget, max_side=0):
+        """Register a plan of up to `budget` frames, chosen by an AdaptiveSampler during decode()."""
+        if name not in self._plans:
+            self._samplers[name] = AdaptiveSampler(self.total_frames, budget)
+            self._sides[name] = max_side
+            self._decoded = False
+        return self
+
+    def request_defaults(self, names=("heatmap", "neural", "keyframes")):
+        """Registers the standard plans used by /analyze_ensemble (or only those in `names`)."""
+        for name in names:
+            self.request_sampled(name, PLAN_BUDGETS[name], PLAN_MAX_SIDES[name])
+        return self
+
+    def decode(self):
+        wanted = {}  # index -> max_side, for fixed plans
+        for name, indices in self._plans.items():
+            for i in indices:
+                wanted[i] = larger_side(wanted.get(i, self._sides[name]), self._sides[name])
+        wanted = {i: side for i, side in wanted.items()
+                  if i not in self._frames or larger_side(self._frame_sides[i], side) != self._frame_sides[i]}
+        samplers = self._samplers
+        if not wanted and not samplers:
+            self._decoded = True
+            return self
+
+        # Samplers need the whole video; fixed plans only up to their last frame
+        last_needed = max(wanted) if wanted else -1
+        index = 0
+        with span("decode", "frame_source"):
+            cap = cv2.VideoCapture(self.video_path)
+            try:
+                while cap.isOpened() and (index <= last_needed or not all(s.done for s in samplers.values())):
+                    # grab() demuxes/decodes without the BGR conversion + copy
+                    if not cap.grab():
+                        break
+                    sampling = [name for name, s in samplers.items() if s.wants(index)]
+                    if index in wanted or sampling:
+                        ret, frame = cap.retrieve()
+                        if ret:
+                            kept = [name for name in sampling if samplers[name].offer(index, frame)]
+                            if index in wanted or kept:
+                                side = wanted[index] if index in wanted else self._sides[kept[0]]
+                                for name in kept:
+                                    side = larger_side(side, self._sides[name])
+                                if index in self._frames:
+                                    side = larger_side(side, self._frame_sides[index])
+                                self._frames[index] = downscale(frame, side)
+                                self._frame_sides[index] = side
+                    index += 1
+            finally:
+                cap.release()
+
+        for name, sampler in samplers.items():
+            self._plans[name] = sampler.indices
+        self._samplers = {}
+
+        print(f"[Frame Source] Decoded {index} frames in one pass, kept {len(self._frames)}.")
+        self._decoded = True
+        return self
+
+    def frames(self, name):
+        """Returns the decoded BGR frames for a plan, in plan order."""
+        if not self._decoded:
+            self.decode()
+        return [self._frames[i] for i in self._plans.get(name, []) if i in self._frames]
+
+    def plan_fps(self, name):
+        """Average frame rate of a plan's frames over the video (fps for a video made of them)."""
+        if not self._decoded:
+            self.decode()
+        return sampled_fps(self.fps, self.total_frames, len(self._plans.get(name, [])))
+
+    def release_plan(self, name):
+        """Drops a plan whose engine is done, and the frames no other plan still needs."""
+        self._plans.pop(name, None)
+        self._samplers.pop(name, None)
+        self._sides.pop(name, None)
+        needed = set()
+        for indices in self._plans.values():
+            needed.update(indices)
+        for index in set(self._frames) - needed:
+            del self._frames[index]
+            del self._frame_sides[index]
+
+    def release(self):
+        self._frames.clear()
+        self._frame_sides.clear()
+        self._decoded = False
+
+
+def encode_jpeg(frame, quality=95, max_side=0):
+    """
+    Encodes a BGR frame to JPEG bytes in memory. Frames whose longest side
+    exceeds `max_side` (0 = no cap) are downscaled first.
+    """
+    ok, buffer = cv2.imencode(".jpg", downscale(frame, max_side), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("JPEG encoding failed.")
+    return buffer.tobytes()
@@ -0,0 +1,119 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+
+
+class GeminiFilesClient:
+    """
+    Minimal client for the Gemini Files API (upload + status polling).
+
+    All calls share one pooled requests.Session, so parallel uploads reuse
+    warm TLS connections instead of opening one per file. `base_url` can
+    point at a local stand-in server for testing and benchmarking.
+    """
+
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL, max_workers=6, timeout=120.0):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["x-goog-api-key"] = api_key
+
+    # --- UPLOADS ---
+    def upload(self, data, mime_type, display_name):
+        """
+        Uploads `data` (bytes, or a path to a file) with the resumable protocol
+        and returns the File resource dict (name, uri, mimeType, state...).
+        """
+        if isinstance(data, (bytes, bytearray)):
+            size = len(data)
+        else:
+            size = os.path.getsize(data)
+
+        # 1. Start the session: metadata only, the server answers with an upload URL
+        start = self.session.post(
+            f"{self.base_url}/upload/v1beta/files",
+            headers={
+                "X-Goog-Upload-Protocol": "resumable",
+                "X-Goog-Upload-Command": "start",
+                "X-Goog-Upload-Header-Content-Length": str(size),
+                "X-Goog-Upload-Header-Content-Type": mime_type,
+            },
+            json={"file": {"display_name": display_name}},
+            timeout=self.timeout,
+        )
+        start.raise_for_status()
+        upload_url = start.headers["X-Goog-Upload-URL"]
+
+        # 2. Send the bytes and finalize in one request (files are streamed, not read into memory)
+        headers = {
+            "Content-Length": str(size),
+            "X-Goog-Upload-Offset": "0",
+            "X-Goog-Upload-Command": "upload, finalize",
+        }
+        if isinstance(data, (bytes, bytearray)):
+            response = self.session.post(upload_url, headers=headers, data=data, timeout=self.timeout)
+        else:
+            with open(data, "rb") as f:
+                response = self.session.post(upload_url, headers=headers, data=f, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["file"]
+
+    def upload_many(self, items):
+        """
+        Uploads [(data, mime_type, display_name), ...] concurrently on a bounded
+        pool. Returns the File resources in the same order as `items`.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gemini-upload") as pool:
+            futures = [pool.submit(self.upload, *item) for item in items]
+            return [future.result() for future in futures]
+
+    # --- STATUS ---
+    def get(self, name):
+        response = self.session.get(f"{self.base_url}/v1beta/{name}", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def wait_until_active(self, file, deadline, initial_delay=1.0, max_delay=10.0, cancel=None):
+        """
+        Polls until the file leaves PROCESSING, backing off exponentially
+        (1s, 2s, 4s ... capped at max_delay). Raises TimeoutError once
+        `deadline` seconds have passed, ValueError if processing FAILED.
+        Returns early (still PROCESSING) once the optional threading.Event
+        `cancel` is set.
+        """
+        give_up_at = time.monotonic() + deadline
+        delay = initial_delay
+        while file.get("state") == "PROCESSING":
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"{file['name']} still processing after {deadline:.0f}s.")
+            if cancel is not None:
+                if cancel.wait(min(delay, remaining)):
+                    return file
+            else:
+                time.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+            file = self.get(file["name"])
+
+        if file.get("state") == "FAILED":
+            raise ValueError("Video processing failed on Google server.")
+        return file
+
+    @staticmethod
+    def as_part(file):
+        """Turns a File resource into a generate_content() content part."""
+        return {"file_data": {"mime_type": file["mimeType"], "file_uri": file["uri"]}}
+
+    def close(self):
+        self.session.close()
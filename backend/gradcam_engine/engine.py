@@ -8,6 +8,8 @@ import time
 
 from .models import DeepfakeResNet18
 from .grad_cam import GradCAM, overlay_cam_on_image
+from stream_pipeline import StreamPipeline
+from frame_sampler import AdaptiveSampler
 
 class GradCAMDeepfakeDetector:
     def __init__(self, model_path="models/best_resnet18.pth", device=None):
@@ -48,15 +50,20 @@ class GradCAMDeepfakeDetector:
              self.is_demo = True
         
         self.model.eval()
+        # Inference only, and this engine owns the model: no parameter .grad buffers
+        self.model.requires_grad_(False)
         
         # Hook into last layer
         self.target_layer = self.model.backbone.layer4[-1]
-        self.grad_cam = GradCAM(self.model, self.target_layer)
+        self.grad_cam = GradCAM(self.model, self.target_layer, freeze_params=True)
 
-    def process_video(self, input_path, output_path, frame_step=5):
+    def process_video(self, input_path, output_path=None, frame_step=5):
         """
         Reads video, applies Grad-CAM, saves heatmap video to output_path.
-        Returns (avg_fake_prob, output_path)
+        With output_path=None frames are only scored (no CAM, no video).
+        One frame in `frame_step` is analysed on average, sampled adaptively
+        (denser after scene cuts) over the whole video.
+        Returns (avg_fake_prob, output_path, is_demo)
         """
         cap = cv2.VideoCapture(input_path)
         if not cap.isOpened():
@@ -67,55 +74,45 @@ class GradCAMDeepfakeDetector:
         fps    = cap.get(cv2.CAP_PROP_FPS)
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        # Use avc1 (H.264) codec for browser compatibility
-        # If this fails on your specific Windows setup without ffmpeg, try 'mp4v' or 'vp90' (webm)
-        try:
-             fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        except:
-             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-             
-        out = cv2.VideoWriter(output_path, fourcc, fps / frame_step, (width, height))
-        
-        frame_idx = 0
-        fake_probs = []
+        out = None
+        if output_path:
+            # Use avc1 (H.264) codec for browser compatibility
+            # If this fails on your specific Windows setup without ffmpeg, try 'mp4v' or 'vp90' (webm)
+            try:
+                 fourcc = cv2.VideoWriter_fourcc(*'avc1')
+            except:
+                 fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+
+            out = cv2.VideoWriter(output_path, fourcc, fps / frame_step, (width, height))
         
         print(f"[Grad-CAM] Processing {total_frames} frames from {input_path}...")
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            frame_idx += 1
-            if frame_idx % frame_step != 0:
-                continue
-                
-            # Preprocess
+
+        def prepare(frame):
+            # Preprocess (runs on the pipeline's preprocess pool)
             rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             pil_img = Image.fromarray(rgb)
-            tensor = self.transform(pil_img).unsqueeze(0).to(self.device)
-            
+            return self.transform(pil_img).unsqueeze(0).to(self.device)
+
+        def infer(tensors):
             # Predict
-            # GradCAM requires gradients, so we might need to enable grad even in inference for the backward pass
-            # usually model.eval() is fine, but we need to ensure gradients flow back to valid hooks.
-            # In pytorch, backward() works if req_grad is True on params.
-            
-            # To be safe for GradCAM, we might need a separate forward pass
-            # Or ensure params have requires_grad=True? 
-            # Usually during inference we do torch.no_grad(), but GradCAM NEEDS grad.
-            # So we do NOT use torch.no_grad() here.
-            
-            outputs = self.model(tensor)
-            probs = torch.softmax(outputs, dim=1)
-            prob_fake = probs[0, 1].item() # Class 1 = Fake
-            pred_idx = outputs.argmax(dim=1).item()
-            
-            fake_probs.append(prob_fake)
-            
-            # Generate Heatmap
-            cam = self.grad_cam.generate(tensor, class_idx=pred_idx)
-            
-            # Overlay
+            # GradCAM requires gradients, so we do NOT use torch.no_grad() here,
+            # unless there is no video to draw (scoring only)
+            results = []
+            for tensor in tensors:
+                outputs = self.grad_cam.forward(tensor) if out is not None else self.grad_cam.score(tensor)
+                probs = torch.softmax(outputs.detach(), dim=1)
+                prob_fake = probs[0, 1].item() # Class 1 = Fake
+                pred_idx = outputs.argmax(dim=1).item()
+                
+                # Generate Heatmap (backward from the same forward pass)
+                cam = self.grad_cam.generate(output=outputs, class_idx=pred_idx) if out is not None else None
+                results.append((prob_fake, pred_idx, cam))
+            return results
+
+        def write(frame, result):
+            prob_fake, pred_idx, cam = result
+
+            # Overlay (runs on the pipeline's writer thread)
             if cam is not None:
                 overlay = overlay_cam_on_image(frame, cam, alpha=0.5)
             else:
@@ -128,9 +125,16 @@ class GradCAMDeepfakeDetector:
                         cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
             
             out.write(overlay)
-            
-        cap.release()
-        out.release()
+
+        pipeline = StreamPipeline(prepare, infer, write if out is not None else None, batch_size=1, name="gradcam")
+        try:
+            sampler = AdaptiveSampler(total_frames, max(1, -(-total_frames // frame_step)))
+            results = pipeline.run(sampler.frames(cap))
+        finally:
+            cap.release()
+            if out is not None:
+                out.release()
+        fake_probs = [prob_fake for prob_fake, _, _ in results]
         
         if not fake_probs:
             return 0.0, output_path, self.is_demo
@@ -4,34 +4,71 @@ import numpy as np
 import torch.nn.functional as F
 
 class GradCAM:
-    def __init__(self, model, target_layer):
+    """
+    Grad-CAM on `target_layer`. The forward pass can be shared with scoring,
+    so a frame costs one forward + one backward instead of two forwards:
+
+        output = grad_cam.forward(x)                      # logits (layer activations recorded)
+        cam = grad_cam.generate(output=output, class_idx=k)
+
+    generate(x) still runs its own forward pass. score(x) is forward-only
+    under inference_mode, for frames that don't need a heatmap.
+
+    freeze_params: the caller has frozen the model's parameters
+    (model.requires_grad_(False)), so only the gradient w.r.t. the target
+    layer's output is taken (torch.autograd.grad): no parameter .grad buffers,
+    and backward stops at the target layer. GradCAM never changes the model's
+    flags itself. False (default) is the classic full backward (e.g. while training).
+    """
+    def __init__(self, model, target_layer, freeze_params=False):
         self.model = model
         self.target_layer = target_layer
+        self.freeze_params = freeze_params
 
         self.activations = None
         self.gradients = None
+        self._output = None  # Target layer output, still attached to the graph
 
         self._register_hooks()
 
     def _register_hooks(self):
         def forward_hook(module, inp, out):
+            if self.freeze_params and torch.is_grad_enabled():
+                # Nothing upstream needs gradients: the graph starts here
+                self._output = out.requires_grad_()
             self.activations = out.detach()
 
         def backward_hook(module, grad_in, grad_out):
             self.gradients = grad_out[0].detach()
 
         self.target_layer.register_forward_hook(forward_hook)
-        self.target_layer.register_backward_hook(backward_hook)
+        if not self.freeze_params:
+            self.target_layer.register_backward_hook(backward_hook)
+
+    def forward(self, input_tensor):
+        """Logits with the autograd graph kept, ready for generate(output=...)."""
+        with torch.enable_grad():
+            return self.model(input_tensor)
+
+    def score(self, input_tensor):
+        """Logits only: no graph, no CAM."""
+        with torch.inference_mode():
+            return self.model(input_tensor)
 
-    def generate(self, input_tensor, class_idx=None):
-        self.model.zero_grad()
-        output = self.model(input_tensor)
+    def generate(self, input_tensor=None, class_idx=None, output=None):
+        if output is None:
+            output = self.forward(input_tensor)
 
         if class_idx is None:
             class_idx = output.argmax(dim=1).item()
 
         loss = output[:, class_idx]
-        loss.backward()
+        if self.freeze_params:
+            self.gradients, = torch.autograd.grad(loss.sum(), self._output)
+            self._output = None
+        else:
+            self.model.zero_grad()
+            loss.backward()
 
         gradients = self.gradients
         activations = self.activations
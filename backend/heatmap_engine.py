@@ -1,163 +1,253 @@
+import uuid
+import threading
 import torch
 from torchvision import models, transforms
 import cv2
 import numpy as np
 from PIL import Image
 
+from config import (
+    HEATMAP_BATCH_SIZE, HEATMAP_OUTPUT_PROFILE, OUTPUT_PROFILES, OUTPUT_DIR,
+    HEATMAP_MICROBATCH_SIZE, MICROBATCH_MAX_WAIT_MS, HEATMAP_FRAME_BUDGET,
+)
+from frame_sampler import sample_frames, sampled_fps
+from frame_source import downscale
+from stream_pipeline import StreamPipeline
+from video_output import VideoOutput
+from micro_batcher import MicroBatcher
+from telemetry import span, StageTimer
+from early_stop import SequentialVerdict, check_cancelled, stop_condition
+
 # --- NVIDIA GPU SETUP ---
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 print(f"Running Heatmap Engine on: {device}")
 
-# 1. SETUP THE MODEL (Pre-trained ImageNet)
-try:
-    model = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
-    model = model.to(device)
-    model.eval()
-except Exception as e:
-    print(f"Error loading ResNet: {e}")
-    model = None
-
-# Hooks for the heatmap
-gradients = None
-activations = None
+# 1. THE MODEL (Pre-trained ImageNet) - loaded on first use by load_model()
+model = None
+batcher = None
+_load_lock = threading.Lock()
 
-def backward_hook(module, grad_input, grad_output):
-    global gradients
-    gradients = grad_output[0]
+preprocess = transforms.Compose([
+    transforms.Resize((224, 224)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
+])
 
-def forward_hook(module, input, output):
-    global activations
-    activations = output
+# Hook for the heatmap: layer4's output, the only tensor we need gradients for
+activations = None
 
-# Hook into layer4
-if model:
-    target_layer = model.layer4[-1]
-    target_layer.register_forward_hook(forward_hook)
-    target_layer.register_full_backward_hook(backward_hook)
+# Optional model_server.ModelClient: when set, the forward/backward runs in the
+# shared model server process instead of this one (see use_model_server)
+model_server = None
 
-def process_video_heatmap(video_path):
-    if not model:
-        return None
+# The hook above is a module global, so concurrent requests (ensemble runs
+# engines on a thread pool) must not interleave forward/backward passes.
+_inference_lock = threading.Lock()
 
-    cap = cv2.VideoCapture(video_path)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    
-    import os
-    # Ensure 'generated' folder exists
-    output_dir = "generated"
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    # OUTPUT FILE: We prefer WebM (VP9) or MP4 (H.264) for browsers
-    # MP4V is often blocked by Chrome/Edge.
+def forward_hook(module, input, output):
+    # Parameters are frozen, so layer4's output starts the autograd graph:
+    # backward then only runs through avgpool/fc, never the layers below
+    global activations
+    activations = output.requires_grad_()
+
+def load_model():
+    """Loads ResNet18 and hooks layer4 (once). Returns the model, or None on failure."""
+    global model
+    with _load_lock:
+        if model is not None:
+            return model
+        try:
+            resnet = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
+            resnet = resnet.to(device)
+            resnet.eval()
+            resnet.requires_grad_(False)  # No parameter .grad buffers: Grad-CAM only needs d(score)/d(layer4)
+        except Exception as e:
+            print(f"Error loading ResNet: {e}")
+            return None
+
+        # Hook into layer4
+        target_layer = resnet.layer4[-1]
+        target_layer.register_forward_hook(forward_hook)
+        model = resnet
+
+        # Frames from every in-flight request share forward/backward passes
+        global batcher
+        batcher = MicroBatcher(_heatmap_batch, HEATMAP_MICROBATCH_SIZE, MICROBATCH_MAX_WAIT_MS, name="heatmap")
+        return model
+
+def use_model_server(client):
+    """Routes Grad-CAM to a shared model server; ResNet18 is then never loaded here."""
+    global model_server
+    model_server = client
+
+def _heatmap_batch(tensors):
+    return list(generate_heatmaps(torch.stack([torch.as_tensor(t) for t in tensors]).to(device)))
+
+def compute_heatmaps(batch):
+    """
+    [N, 3, 224, 224] CPU tensor -> [N, 7, 7] heatmaps, on the model server if
+    one is configured, else through the micro-batcher (merged with other requests).
+    """
+    if model_server is not None:
+        return model_server.heatmaps(batch.numpy())
+    return np.stack(batcher.submit(list(batch)))
+
+def generate_heatmaps(input_tensor):
+    """
+    Grad-CAM for a whole batch in one forward/backward pass.
+    input_tensor: [N, 3, 224, 224] on `device`.
+    Returns N normalized float32 heatmaps (7x7, values 0..1).
+    """
+    with _inference_lock, torch.enable_grad():
+        # 2. Forward Pass
+        with span("forward", "heatmap"):
+            output = model(input_tensor)
+
+        # 3. Backprop each frame's top class. Samples don't interact in eval
+        # mode, so summing gives every frame its own gradient in one pass.
+        # Only the activation gradient is taken (no parameter grads, nothing below layer4).
+        top_class = output.argmax(dim=1, keepdim=True)
+        score = output.gather(1, top_class).sum()
+        with span("backward", "heatmap"):
+            gradients, = torch.autograd.grad(score, activations)
+
+        # Pool the gradients per frame, weight the channels (vectorized,
+        # [N, 512, 1, 1] * [N, 512, 7, 7]) and average them into the heatmap
+        pooled_gradients = torch.mean(gradients, dim=[2, 3], keepdim=True)
+        heatmaps = torch.mean(activations * pooled_gradients, dim=1).detach().cpu().numpy()
+
+    # ReLU (remove negatives)
+    heatmaps = np.maximum(heatmaps, 0).astype(np.float32)
+
+    # Normalize each frame to 0..1 (FLOAT32 for OpenCV compatibility)
+    max_vals = heatmaps.max(axis=(1, 2), keepdims=True)
+    np.divide(heatmaps, max_vals, out=heatmaps, where=max_vals > 0)
+    return heatmaps
+
+def overlay_heatmap(frame, heatmap, size=None):
+    """Blends a 0..1 heatmap over a BGR frame, at `size` (w, h) if given (else frame size)."""
+    if size and (frame.shape[1], frame.shape[0]) != tuple(size):
+        frame = cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+    height, width = frame.shape[:2]
+    heatmap_resized = cv2.resize(heatmap, (width, height))
     
-    # Attempt 1: H.264 (Best for MP4)
-    output_path = os.path.join(output_dir, "heatmap_output.mp4")
-    try:
-        fourcc = cv2.VideoWriter_fourcc(*'avc1')
-        print("Heatmap Engine: Trying codec 'avc1' (H.264)")
-    except:
-        fourcc = None
-
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+    # Convert to 0-255 color map
+    heatmap_colored = cv2.applyColorMap(np.uint8(255 * heatmap_resized), cv2.COLORMAP_JET)
     
-    # Fallback / Check if opened
-    if not out.isOpened():
-        print("Heatmap Engine: 'avc1' failed. Trying 'vp09' (WebM)...")
-        output_path = os.path.join(output_dir, "heatmap_output.webm")
-        fourcc = cv2.VideoWriter_fourcc(*'vp09') # VP9
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-        
-        if not out.isOpened():
-            print("Heatmap Engine: 'vp09' failed. Fallback to 'mp4v' (Legacy)...")
-            output_path = os.path.join(output_dir, "heatmap_output.mp4")
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-
-    preprocess = transforms.Compose([
-        transforms.Resize((224, 224)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-    ])
-
-    frame_count = 0
-    # Process max 150 frames to save time
-    while cap.isOpened() and frame_count < 150:
-        ret, frame = cap.read()
-        if not ret: 
-            break
-
-        # 1. Prepare Frame
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        pil_img = Image.fromarray(rgb_frame)
-        
-        # Move input to GPU
-        input_tensor = preprocess(pil_img).unsqueeze(0).to(device) 
+    # Blend
+    return cv2.addWeighted(frame, 0.6, heatmap_colored, 0.4, 0)
+
+def heatmap_score(heatmap):
+    """
+    Threat score (0-100) for one frame's heatmap.
+    Intensity = Mean value of the normalized heatmap (0.0 to 1.0)
+    We map 0.0-0.5 (Cold) -> 0-50 score
+    We map 0.5-1.0 (Hot) -> 50-100 score
+    """
+    intensity = float(np.mean(heatmap)) if heatmap is not None else 0.0
+    return min(max(intensity * 100 * 1.5, 0), 100) # 1.5 multiplier to make it more sensitive
+
+def process_video_heatmap(video_path, frames=None, fps=None, batch_size=None, progress=None, profile=None,
+                          on_frame=None, write_video=True, output_name=None, early_stop=False, cancel=None):
+    """
+    frames: optional list of pre-decoded BGR frames (e.g. from FrameSource),
+    in which case the video is not opened again; fps is then their average rate.
+    batch_size: frames per forward/backward pass (default HEATMAP_BATCH_SIZE).
+    progress: optional callback(done, total) called after every batch.
+    profile: output profile name ("preview" / "full") or a {"max_side", "fps", "codec"}
+    dict (default HEATMAP_OUTPUT_PROFILE).
+    on_frame: optional callback(index, frame, heatmap) called for every frame as
+    soon as its heatmap exists (used to stream results before the encode ends).
+    write_video: False skips the output video entirely ("video_path" is None).
+    output_name: file name (without extension) in generated/. Defaults to a unique
+    per-call name, so concurrent requests never write the same file.
+    early_stop: stop once the per-frame scores' confidence interval is clearly on
+    one side of the threshold (the score is the mean of the frames analysed so far).
+    cancel: optional threading.Event; once set the engine stops and raises EngineCancelled.
+    """
+    if model_server is None and not load_model():
+        return None
 
-        # 2. Forward Pass
-        output = model(input_tensor)
-        
-        # 3. Generate Heatmap
-        score = output[:, output.argmax(dim=1).item()]
-        model.zero_grad()
-        score.backward()
-
-        # Get gradients and activations
-        # Pool the gradients across the channels
-        pooled_gradients = torch.mean(gradients, dim=[0, 2, 3])
-        
-        # Weight the activations by the gradients
-        # We perform this on the GPU to be fast
-        weighted_activations = activations.clone()
-        for i in range(weighted_activations.size(1)):
-            weighted_activations[:, i, :, :] *= pooled_gradients[i]
-        
-        # Average the channels to get the heatmap
-        heatmap = torch.mean(weighted_activations, dim=1).squeeze().cpu().detach().numpy()
-        
-        # ReLU (remove negatives)
-        heatmap = np.maximum(heatmap, 0)
-        
-        # --- THE FIX IS HERE ---
-        # Normalize and ensure FLOAT32 for OpenCV compatibility
-        heatmap = np.array(heatmap, dtype=np.float32)
-        
-        max_val = np.max(heatmap)
-        if max_val > 0:
-            heatmap /= max_val
-        # -----------------------
-
-        # 4. Overlay Heatmap
-        # Now 'heatmap' is definitely a numpy array, so cv2.resize works.
-        heatmap_resized = cv2.resize(heatmap, (width, height))
-        
-        # Convert to 0-255 color map
-        heatmap_colored = cv2.applyColorMap(np.uint8(255 * heatmap_resized), cv2.COLORMAP_JET)
-        
-        # Blend
-        superimposed = cv2.addWeighted(frame, 0.6, heatmap_colored, 0.4, 0)
-        out.write(superimposed)
-        frame_count += 1
-
-    cap.release()
-    out.release()
+    if isinstance(profile, str) or profile is None:
+        profile = OUTPUT_PROFILES[profile or HEATMAP_OUTPUT_PROFILE]
+    if frames is None:
+        cap = cv2.VideoCapture(video_path)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = sampled_fps(cap.get(cv2.CAP_PROP_FPS), frame_count, HEATMAP_FRAME_BUDGET)
+        total = min(HEATMAP_FRAME_BUDGET, frame_count)
+        cap.release()
+        # Fixed frame budget (150), spread over the whole video and denser after scene cuts
+        # Kept no bigger than the output (as FrameSource does), so both paths score the same pixels
+        frames = (downscale(frame, profile["max_side"]) for frame in sample_frames(video_path, HEATMAP_FRAME_BUDGET))
+    else:
+        if not frames:
+            return None
+        height, width = frames[0].shape[:2]
+        fps = fps or 30.0
+        total = len(frames)
     
-    # Calculate Threat Score based on how "Hot" the overall heatmap was
-    # If heatmap is full of reds (near 1.0), score is high.
-    # Note: 'heatmap' variable tracks the last frame. Ideally we'd track average across frames.
-    # But for now, we'll just check the intensity of the *last* frame which is often representative, 
-    # OR we can improve this loop to track global intensity. 
-    # Let's keep it simple: Use the last frame's heatmap intensity as the score proxy.
-    
-    # Intensity = Mean value of the normalized heatmap (0.0 to 1.0)
-    # We map 0.0-0.5 (Cold) -> 0-50 score
-    # We map 0.5-1.0 (Hot) -> 50-100 score
-    intensity = float(np.mean(heatmap)) if 'heatmap' in locals() else 0.0
-    deepfake_score = min(max(intensity * 100 * 1.5, 0), 100) # 1.5 multiplier to make it more sensitive
+    # OUTPUT FILE: size, fps and codec come from the output profile; the codec
+    # was probed once at startup (video_output.probe_codecs), not per request.
+    out = None
+    if write_video:
+        out = VideoOutput(OUTPUT_DIR, output_name or f"heatmap_{uuid.uuid4().hex[:16]}", width, height, fps, profile)
+
+    def prepare(frame):
+        # 1. Prepare Frame (runs on the pipeline's preprocess pool)
+        return preprocess(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+
+    def infer(tensors):
+        # 2-3. Forward + Backward for the whole batch ([N, 3, 224, 224])
+        return compute_heatmaps(torch.stack(tensors))
+
+    overlay_timer = StageTimer("overlay", "heatmap")
+    encode_timer = StageTimer("encode", "heatmap")
+    written = [0]
+    def emit(frame, heatmap):
+        # 4. Overlay / stream each frame (runs on the pipeline's writer thread)
+        if on_frame:
+            on_frame(written[0], frame, heatmap)
+        written[0] += 1
+
+        if out is None:
+            return
+        if not out.wants():
+            out.skip()  # Dropped by the output fps: no resize/blend work
+            return
+        # Blend at output resolution, not source resolution
+        with overlay_timer.measure():
+            blended = overlay_heatmap(frame, heatmap, out.size)
+        with encode_timer.measure():
+            out.write(blended)
+
+    writer = emit if (out is not None or on_frame) else None
+    verdict = SequentialVerdict() if early_stop else None
+    until = stop_condition(verdict, cancel, score=heatmap_score) if (verdict or cancel) else None
+    pipeline = StreamPipeline(prepare, infer, writer, batch_size=batch_size or HEATMAP_BATCH_SIZE, name="heatmap")
+    try:
+        heatmaps = pipeline.run(frames, progress=progress, total=total, until=until)
+        check_cancelled(cancel, "Heatmap")
+    except BaseException:
+        if out is not None:
+            out.release(keep=False)
+        raise
+    finally:
+        overlay_timer.record()
+        encode_timer.record()
+    if out is not None:
+        out.release()
+
+    # Threat score = how "Hot" the heatmaps were, averaged over every analysed
+    # frame (the frames are spread over the whole video). Early stopping
+    # decides on this same running mean, so the score means the same either way.
+    scores = [heatmap_score(heatmap) for heatmap in heatmaps]
+    deepfake_score = sum(scores) / len(scores) if scores else heatmap_score(None)
     
     return {
         "deepfake_score": round(deepfake_score, 2),
-        "video_path": output_path
-    }
\ No newline at end of file
+        "video_path": out.path if out is not None else None,
+        "frames_analyzed": len(heatmaps),
+        "early_stop": verdict.decided() if verdict is not None else None
+    }
@@ -0,0 +1,92 @@
+import json
+import base64
+import asyncio
+import concurrent.futures
+
+import numpy as np
+
+from frame_source import encode_jpeg
+
+STREAM_FORMATS = ("grid", "jpeg")
+
+
+class StreamCancelled(Exception):
+    """Raised inside the engine thread once the client has gone away."""
+
+
+def sse_event(event, data):
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def cam_grid(heatmap):
+    """A 0..1 heatmap as rows of 0-255 ints; the frontend colorizes/upscales it itself."""
+    return np.rint(np.clip(heatmap, 0, 1) * 255).astype(np.uint8).tolist()
+
+
+class FrameRelay:
+    """
+    Hands events from an engine thread to the asyncio loop serving the stream.
+
+    put() blocks the engine (its writer thread) while `max_pending` events are
+    waiting, so a slow client slows the engine down instead of piling frames
+    up in memory. Once cancel() is called (client disconnected) or the engine's
+    own `cancel` Event is set (timeout), put() raises StreamCancelled, which
+    stops the engine's pipeline. fail() ends the stream from the loop side.
+    """
+
+    def __init__(self, loop, max_pending=32):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.cancelled = False
+        self.failure = None
+
+    def put(self, event, data, cancel=None):
+        def stopped():
+            return self.cancelled or (cancel is not None and cancel.is_set())
+
+        if stopped():
+            raise StreamCancelled()
+        future = asyncio.run_coroutine_threadsafe(self.queue.put((event, data)), self.loop)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except concurrent.futures.TimeoutError:
+                if stopped():
+                    future.cancel()
+                    raise StreamCancelled()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def fail(self, detail):
+        """On the loop: stops the engine and ends the stream with an "error" event (after what is queued)."""
+        self.cancelled = True
+        self.failure = detail
+        if not self.queue.full():
+            self.queue.put_nowait(("error", {"detail": detail}))
+
+    async def events(self):
+        """Yields (event, data) until an event named "done" or "error" has been sent."""
+        while True:
+            event, data = await self.queue.get()
+            yield event, data
+            if event in ("done", "error"):
+                return
+            if self.failure is not None and self.queue.empty():
+                # fail() found the queue full: the error goes out once it has drained
+                yield "error", {"detail": self.failure}
+                return
+
+
+def frame_payload(index, heatmap, score, running_score, overlay=None):
+    """
+    The data of one "frame" event: the rendered `overlay` as a base64 JPEG if
+    given ("jpeg" format), else the compact CAM grid ("grid" format).
+    """
+    payload = {"index": index, "score": round(score, 2), "running_score": round(running_score, 2)}
+    if overlay is not None:
+        payload["jpeg"] = base64.b64encode(encode_jpeg(overlay, quality=80)).decode("ascii")
+    else:
+        payload["cam"] = cam_grid(heatmap)
+    return payload
@@ -0,0 +1,130 @@
+import time
+import uuid
+import asyncio
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    """One queued analysis. Engines report into `engines` while it runs."""
+
+    def __init__(self, mode, engines, payload):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.status = "queued"   # queued -> running -> done / failed
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.payload = payload
+        self.result = None
+        self.error = None
+        self.engines = {
+            name: {"status": "pending", "progress": 0.0, "score": None}
+            for name in engines
+        }
+
+    def update_engine(self, name, **fields):
+        self.engines.setdefault(name, {"status": "pending", "progress": 0.0, "score": None}).update(fields)
+
+    def engine_progress(self, name):
+        """Returns a progress(done, total) callback for the engine `name`."""
+        def report(done, total):
+            if total:
+                self.update_engine(name, progress=round(min(done / total, 1.0), 3))
+        return report
+
+    @property
+    def progress(self):
+        if self.status == "done":
+            return 1.0
+        if not self.engines:
+            return 0.0
+        return round(sum(e["progress"] for e in self.engines.values()) / len(self.engines), 3)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "mode": self.mode,
+            "status": self.status,
+            "progress": self.progress,
+            "engines": self.engines,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    In-process bounded job queue. `runner(job)` is an async callable that
+    does the actual analysis; `workers` jobs run at the same time and
+    finished jobs are kept for `result_ttl` seconds so clients can poll them.
+    """
+
+    def __init__(self, runner, max_queue=16, workers=1, result_ttl=3600):
+        self.runner = runner
+        self.max_queue = max_queue
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._queue = None
+        self._tasks = []
+        self._jobs = {}
+
+    def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"[Jobs] {self.workers} worker(s) started (queue size {self.max_queue}).")
+
+    def submit(self, job):
+        self._purge()
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"Job queue is full ({self.max_queue} pending).")
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        self._purge()
+        return self._jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started = time.time()
+            try:
+                job.result = await self.runner(job)
+                job.status = "done"
+            except Exception as e:
+                print(f"[Jobs] Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished = time.time()
+                self._queue.task_done()
+
+    def _purge(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def stats(self):
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+            "done": statuses.count("done"),
+            "failed": statuses.count("failed"),
+            "max_queue": self.max_queue,
+        }
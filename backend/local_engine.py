@@ -1,14 +1,81 @@
 import torch
 import torch.nn as nn
-from torchvision import transforms
+import torch.nn.functional as F
 from facenet_pytorch import MTCNN
 import cv2
 import numpy as np
-from PIL import Image
 import os
 
 # Import the correct model architecture
 from model_loader import load_model
+from stream_pipeline import StreamPipeline
+from frame_sampler import sample_frames
+from config import (
+    LOCAL_FACE_BATCH_SIZE, LOCAL_DETECT_MODE, LOCAL_TRACK_IOU, LOCAL_TRACK_MAX_GAP,
+    LOCAL_SEQ_LEN, LOCAL_SEQ_STRIDE, MICROBATCH_MAX_WAIT_MS,
+)
+from micro_batcher import MicroBatcher
+from telemetry import span
+
+# --- FACE TRACKS ---
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def link_tracks(detections, iou_threshold=LOCAL_TRACK_IOU, max_gap=LOCAL_TRACK_MAX_GAP):
+    """
+    Greedily links (frame_index, box) detections into per-identity tracks.
+    A face joins the live track whose last box overlaps it most; a track
+    dies once it has been missing for more than `max_gap` sampled frames.
+    Returns a list of tracks, each a list of detection indices in time order.
+    """
+    tracks = []
+    by_frame = {}
+    for i, (frame_index, _) in enumerate(detections):
+        by_frame.setdefault(frame_index, []).append(i)
+
+    for frame_index in sorted(by_frame):
+        live = [t for t in tracks if frame_index - detections[t[-1]][0] <= max_gap + 1]
+        # Best matches first, so two faces never compete for the same track
+        pairs = sorted(
+            ((box_iou(detections[t[-1]][1], detections[i][1]), n, i)
+             for n, t in enumerate(live) for i in by_frame[frame_index]),
+            reverse=True,
+        )
+        used_tracks, used_faces = set(), set()
+        for iou, n, i in pairs:
+            if iou < iou_threshold:
+                break
+            if n in used_tracks or i in used_faces:
+                continue
+            live[n].append(i)
+            used_tracks.add(n)
+            used_faces.add(i)
+        for i in by_frame[frame_index]:
+            if i not in used_faces:
+                tracks.append([i])
+    return tracks
+
+def track_windows(tracks, seq_len=LOCAL_SEQ_LEN, stride=LOCAL_SEQ_STRIDE):
+    """
+    Splits each track into LSTM sequences of up to `seq_len` crops. Longer
+    tracks get overlapping windows every `stride` crops, the last one
+    aligned to the end of the track so no frame is dropped.
+    """
+    windows = []
+    for track in tracks:
+        if len(track) <= seq_len:
+            windows.append(track)
+            continue
+        starts = list(range(0, len(track) - seq_len + 1, stride))
+        if starts[-1] != len(track) - seq_len:
+            starts.append(len(track) - seq_len)
+        windows.extend(track[s:s + seq_len] for s in starts)
+    return windows
+
 
 class LocalDeepfakeDetector:
     def __init__(self, model_path="models/best_model.pth", device=None):
@@ -31,49 +98,45 @@ class LocalDeepfakeDetector:
              # Fallback to CPU for MTCNN if CUDA OOM or issues
             self.mtcnn = MTCNN(keep_all=True, device='cpu')
 
-        # --- 3. Preprocessing ---
-        self.transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-        ])
+        # --- 3. Micro-batcher (crops from concurrent detect() calls share CNN passes) ---
+        if self.model is not None:
+            self.feature_batcher = MicroBatcher(
+                self._feature_batch, LOCAL_FACE_BATCH_SIZE, MICROBATCH_MAX_WAIT_MS, name="local_cnn"
+            )
+
+        # --- 4. Preprocessing (tensor ops, applied to every crop in one go) ---
+        self.input_size = (224, 224)
+        self.mean = torch.tensor([0.485, 0.456, 0.406], device=self.device).view(1, 3, 1, 1)
+        self.std = torch.tensor([0.229, 0.224, 0.225], device=self.device).view(1, 3, 1, 1)
 
-    def detect(self, video_path, num_frames=10):
+    def detect(self, video_path, num_frames=10, batch_size=None, mode=None):
+        """
+        mode: "track" links faces across the sampled frames and scores each
+              identity as a sequence through the LSTM; "frame" scores every
+              crop on its own (Seq=1). Defaults to LOCAL_DETECT_MODE.
+        """
         if not self.model:
             return {"error": "Model not loaded"}
 
-        frames = self._extract_frames(video_path, num_frames)
-        if not frames:
+        mode = mode or LOCAL_DETECT_MODE
+        # Decode and color conversion overlap; all `num_frames` sampled frames (spread over
+        # the whole video, denser after scene cuts) reach MTCNN as one batch
+        pipeline = StreamPipeline(
+            preprocess=lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB),
+            infer=self._detect_faces,
+            batch_size=num_frames,
+            name="local",
+        )
+        detected = pipeline.run(sample_frames(video_path, num_frames))
+        if not detected:
              return {"verdict": "ERROR", "confidence": 0, "details": "Could not extract frames."}
 
-        face_preds = []
-        
-        print(f"[Local Engine] Analyzing {len(frames)} frames...")
-        
-        for frame in frames:
-            pil_img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            
-            # Detect faces
-            boxes, _ = self.mtcnn.detect(pil_img)
-            
-            if boxes is not None:
-                for box in boxes:
-                    # Crop face
-                    face = pil_img.crop(box)
-                    
-                    # Preprocess
-                    # Model expects [Batch, Seq, Channels, H, W]
-                    # We are processing 1 frame at a time which means Seq=1
-                    face_tensor = self.transform(face).unsqueeze(0).unsqueeze(0).to(self.device)
-                    
-                    # Inference
-                    with torch.no_grad():
-                        outputs = self.model(face_tensor)
-                        probs = torch.softmax(outputs, dim=1)
-                        fake_prob = probs[0][1].item() # Assuming index 1 is FAKE
-                        face_preds.append(fake_prob)
-
-        if not face_preds:
+        print(f"[Local Engine] Analyzed {len(detected)} frames ({mode} mode)...")
+        rgb = np.stack([frame for frame, _ in detected])
+        batch_boxes = [boxes for _, boxes in detected]
+
+        faces, detections = self._crop_faces(rgb, batch_boxes)
+        if faces is None:
             return {
                 "verdict": "UNCERTAIN",
                 "confidence": 0,
@@ -81,6 +144,28 @@ class LocalDeepfakeDetector:
                 "mode": "local"
             }
 
+        # One CNN pass per crop for the whole video; every sequence below reuses these
+        features = self._extract_features(faces, batch_size or LOCAL_FACE_BATCH_SIZE)
+
+        if mode == "track":
+            tracks = link_tracks(detections)
+            windows, owners = [], []
+            for n, track in enumerate(tracks):
+                track_seqs = track_windows([track])
+                windows.extend(track_seqs)
+                owners.extend([n] * len(track_seqs))
+            window_preds = self._classify_sequences(features, windows)
+
+            # Average windows per track first, so long tracks don't drown out short ones
+            face_preds = [
+                float(np.mean([p for p, owner in zip(window_preds, owners) if owner == n]))
+                for n in range(len(tracks))
+            ]
+            evidence = f"Linked {len(detections)} face regions into {len(tracks)} face tracks ({len(windows)} sequences)."
+        else:
+            face_preds = self._classify_sequences(features, [[i] for i in range(len(detections))])
+            evidence = f"Analyzed {len(face_preds)} face regions locally."
+
         # Aggregate
         avg_fake_prob = np.mean(face_preds)
         confidence_score = int(avg_fake_prob * 100)
@@ -90,29 +175,73 @@ class LocalDeepfakeDetector:
             "verdict": "DEEPFAKE DETECTED" if is_fake else "LIKELY AUTHENTIC",
             "confidence": confidence_score,
             "evidence": [
-                f"Analyzed {len(face_preds)} face regions locally.",
+                evidence,
                 f"Aggregated Neural Score: {confidence_score}%"
             ],
              "mode": "local"
         }
 
-    def _extract_frames(self, video_path, count):
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return []
-        
-        frames = []
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        if total_frames <= 0: return []
-        
-        step = max(1, total_frames // count)
-        
-        for i in range(0, total_frames, step):
-            cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-            ret, frame = cap.read()
-            if ret:
-                frames.append(frame)
-                if len(frames) >= count:
-                    break
-        cap.release()
-        return frames
+    def _crop_faces(self, rgb, batch_boxes):
+        """
+        Cuts every detected face out of the frame batch. Returns a normalized
+        [num_faces, 3, 224, 224] tensor (or None if there are none) and one
+        (frame_index, box) detection per crop, in the same order.
+        """
+        frames = torch.from_numpy(rgb).to(self.device).permute(0, 3, 1, 2).float().div_(255)
+        height, width = frames.shape[2:]
+
+        crops = []
+        detections = []
+        for frame_index, (frame, boxes) in enumerate(zip(frames, batch_boxes)):
+            if boxes is None:
+                continue
+            for x1, y1, x2, y2 in boxes:
+                x1, y1 = max(0, int(round(x1))), max(0, int(round(y1)))
+                x2, y2 = min(width, int(round(x2))), min(height, int(round(y2)))
+                if x2 <= x1 or y2 <= y1:
+                    continue
+                crop = frame[:, y1:y2, x1:x2].unsqueeze(0)
+                crops.append(F.interpolate(crop, size=self.input_size, mode="bilinear",
+                                           align_corners=False, antialias=True))
+                detections.append((frame_index, (x1, y1, x2, y2)))
+
+        if not crops:
+            return None, []
+        return (torch.cat(crops) - self.mean) / self.std, detections
+
+    def _extract_features(self, faces, batch_size):
+        """CNN features for every crop, submitted `batch_size` crops at a time -> [num_faces, F]."""
+        features = []
+        for start in range(0, len(faces), batch_size):
+            features.extend(self.feature_batcher.submit(list(faces[start:start + batch_size])))
+        return torch.stack(features)
+
+    def _feature_batch(self, crops):
+        # One CNN pass over crops from every in-flight request
+        with span("cnn_forward", "local"), torch.no_grad():
+            return list(self.model.extract_features(torch.stack(crops)))
+
+    def _classify_sequences(self, features, sequences):
+        """
+        FAKE probability per sequence (a list of crop indices, in time order).
+        Sequences of equal length share one LSTM call.
+        """
+        probs = [None] * len(sequences)
+        by_length = {}
+        for i, sequence in enumerate(sequences):
+            by_length.setdefault(len(sequence), []).append(i)
+
+        with span("lstm_forward", "local"), torch.no_grad():
+            for ids in by_length.values():
+                index = torch.tensor([sequences[i] for i in ids], device=features.device)
+                logits = self.model.classify_features(features[index])
+                fake = torch.softmax(logits, dim=1)[:, 1].tolist()  # Assuming index 1 is FAKE
+                for i, p in zip(ids, fake):
+                    probs[i] = p
+        return probs
+
+    def _detect_faces(self, rgb_frames):
+        """MTCNN over a batch of same-sized RGB frames -> [(frame, boxes or None), ...]"""
+        with span("face_detect", "local"):
+            batch_boxes, _ = self.mtcnn.detect(np.stack(rgb_frames))
+        return list(zip(rgb_frames, batch_boxes))
@@ -1,62 +1,157 @@
+import threading
 from transformers import pipeline
 import cv2
-from PIL import Image
 import torch
 
+from config import (
+    NEURAL_BATCH_SIZE, NEURAL_AUTOCAST, NEURAL_MICROBATCH_SIZE, MICROBATCH_MAX_WAIT_MS, NEURAL_FRAME_BUDGET,
+    NEURAL_EARLY_STOP_BATCH_SIZE,
+)
+from frame_sampler import sample_frames
+from stream_pipeline import StreamPipeline
+from micro_batcher import MicroBatcher
+from telemetry import span
+from early_stop import SequentialVerdict, check_cancelled, stop_condition
+
 # --- NVIDIA GPU SETUP ---
 # device=0 targets the first GPU (RTX 4050)
 # device=-1 means CPU
 gpu_id = 0 if torch.cuda.is_available() else -1
 print(f"Running Neural Core on Device ID: {gpu_id}")
 
-try:
-    # Load Deepfake Detector (Dima806)
-    classifier = pipeline("image-classification", model="dima806/deepfake_vs_real_image_detection", device=gpu_id)
-except Exception as e:
-    print(f"Model download failed: {e}")
-    classifier = None
-
-def analyze_video_neural(video_path):
-    cap = cv2.VideoCapture(video_path)
-    frame_scores = []
-    frame_count = 0
-    
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret or frame_count > 40: # Checked 40 frames
-            break
-            
-        if frame_count % 5 == 0:
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            pil_img = Image.fromarray(rgb_frame)
-            
-            if classifier:
-                results = classifier(pil_img)
-                # Structure: [{'label': 'FAKE', 'score': 0.99}, {'label': 'REAL', 'score': 0.01}]
-                # We need to find the "FAKE" score or "REAL" score and normalize.
-                
-                # Default to 0.5 if unclear
-                risk_score = 50.0 
-                
-                for res in results:
-                    if res['label'].upper() == "FAKE":
-                        # If FAKE 0.9 -> Score 90.0
-                        risk_score = res['score'] * 100
-                        break
-                    elif res['label'].upper() == "REAL":
-                        # If REAL 0.9 -> Score 10.0 (1 - 0.9 = 0.1 * 100 = 10)
-                        # But wait, results list usually sums to 1. 
-                        # If we find REAL first, we can interpret it.
-                        risk_score = (1.0 - res['score']) * 100
-                        break
-                
-                frame_scores.append(risk_score)
-            else:
-                frame_scores.append(50.0)
-                
-        frame_count += 1
-    
-    cap.release()
+# Deepfake Detector (Dima806) - built on first use by load_classifier()
+classifier = None
+batcher = None
+_classifier_loaded = False
+_load_lock = threading.Lock()
+
+def load_classifier():
+    """Builds the HuggingFace pipeline once. Returns it, or None if the download failed."""
+    global classifier, _classifier_loaded
+    with _load_lock:
+        if not _classifier_loaded:
+            try:
+                classifier = pipeline("image-classification", model="dima806/deepfake_vs_real_image_detection", device=gpu_id)
+            except Exception as e:
+                print(f"Model download failed: {e}")
+                classifier = None
+            if classifier is not None:
+                # Frames from every in-flight request share ViT passes
+                global batcher
+                batcher = MicroBatcher(
+                    lambda rgb_frames: _classify_batch(classifier, rgb_frames),
+                    NEURAL_MICROBATCH_SIZE, MICROBATCH_MAX_WAIT_MS, name="neural"
+                )
+            _classifier_loaded = True
+        return classifier
+
+# Optional model_server.ModelClient: when set, the ViT runs in the shared
+# model server process and the pipeline is never loaded here
+model_server = None
+
+def use_model_server(client):
+    global model_server
+    model_server = client
+
+def _autocast_dtype():
+    """fp16/bf16 autocast dtype for the configured device, or None to run in fp32."""
+    mode = NEURAL_AUTOCAST.lower()
+    if mode == "off":
+        return None
+    if mode == "fp16":
+        return torch.float16
+    if mode == "bf16":
+        return torch.bfloat16
+    # auto: reduced precision only on GPU, where it is actually faster
+    if gpu_id < 0:
+        return None
+    return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+
+def _fake_index(id2label):
+    """Index of the FAKE class (or of REAL, negated) in the model's label map."""
+    for idx, label in id2label.items():
+        if label.upper() == "FAKE":
+            return int(idx), False
+    for idx, label in id2label.items():
+        if label.upper() == "REAL":
+            return int(idx), True
+    return None, False
+
+def classify_frames(frames, batch_size=None, progress=None, total=None, until=None):
+    """
+    Runs the ViT on BGR frames in batches (one forward pass per batch, no PIL
+    round-trip) and returns one FAKE risk score (0-100) per frame. Decoding and
+    color conversion overlap with inference via the streaming pipeline.
+    until: optional StreamPipeline stop callback (early stopping).
+    """
+    pipeline = StreamPipeline(
+        preprocess=lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB),
+        infer=classify_rgb,
+        batch_size=batch_size or NEURAL_BATCH_SIZE,
+        name="neural",
+    )
+    return pipeline.run(frames, progress=progress, total=total, until=until)
+
+def classify_rgb(rgb_frames):
+    """
+    FAKE scores for RGB frames: on the model server if one is configured, else
+    through the micro-batcher (merged with frames from other requests).
+    """
+    if model_server is not None:
+        return model_server.classify(rgb_frames)
+    if load_classifier() is None:
+        return _classify_batch(None, rgb_frames)  # Neutral 50s
+    return batcher.submit(rgb_frames)
+
+def _classify_batch(classifier, rgb_frames):
+    if not classifier:
+        return [50.0] * len(rgb_frames)
+
+    # Structure: id2label = {0: 'Real', 1: 'Fake'} (order depends on the checkpoint)
+    # We need to find the "FAKE" probability, or invert the "REAL" one.
+    fake_idx, inverted = _fake_index(classifier.model.config.id2label)
+    if fake_idx is None:
+        # Default to 0.5 if unclear
+        return [50.0] * len(rgb_frames)
+
+    model = classifier.model
+    with span("image_processor", "neural"):
+        inputs = classifier.image_processor(images=rgb_frames, return_tensors="pt").to(model.device)
+    dtype = _autocast_dtype()
+    with span("forward", "neural"), torch.inference_mode(), \
+            torch.autocast(model.device.type, dtype=dtype, enabled=dtype is not None):
+        logits = model(**inputs).logits
+
+    probs = torch.softmax(logits.float(), dim=-1)[:, fake_idx]
+    if inverted:
+        # If REAL 0.9 -> Score 10.0
+        probs = 1.0 - probs
+    return (probs * 100).tolist()
+
+def analyze_video_neural(video_path, frames=None, progress=None, frame_budget=NEURAL_FRAME_BUDGET,
+                         batch_size=None, early_stop=False, cancel=None):
+    """
+    frames: optional list of already-sampled BGR frames (e.g. from FrameSource).
+    When omitted, `frame_budget` frames spread over the whole video are sampled from video_path.
+    batch_size: frames per ViT forward pass (default NEURAL_BATCH_SIZE).
+    progress: optional callback(done, total) called after every batch.
+    early_stop: stop once the frame scores' confidence interval is clearly on one side of the threshold.
+    The verdict is checked after every batch, so batches are capped at
+    NEURAL_EARLY_STOP_BATCH_SIZE (a whole budget in one pass would never stop early).
+    cancel: optional threading.Event; once set the engine stops and raises EngineCancelled.
+    """
+    if frames is None:
+        frames = sample_frames(video_path, frame_budget)
+        total = frame_budget
+    else:
+        total = len(frames)
+
+    verdict = SequentialVerdict() if early_stop else None
+    if verdict is not None:
+        batch_size = min(batch_size or NEURAL_BATCH_SIZE, NEURAL_EARLY_STOP_BATCH_SIZE)
+    until = stop_condition(verdict, cancel) if (verdict or cancel) else None
+    frame_scores = classify_frames(frames, batch_size=batch_size, progress=progress, total=total, until=until)
+    check_cancelled(cancel, "Neural")
     
     if not frame_scores:
         return {"label": "UNCERTAIN", "deepfake_score": 50.0}
@@ -68,5 +163,7 @@ def analyze_video_neural(video_path):
     
     return {
         "label": label, 
-        "deepfake_score": round(avg_deepfake_score, 2)
+        "deepfake_score": round(avg_deepfake_score, 2),
+        "frames_analyzed": len(frame_scores),
+        "early_stop": verdict.decided() if verdict is not None else None
     }
\ No newline at end of file
@@ -1,12 +1,41 @@
 import os
-import shutil
 import json
+import mimetypes
 import time
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.staticfiles import StaticFiles
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 import google.generativeai as genai
 from dotenv import load_dotenv
+from config import (
+    ENGINE_WORKERS, CLOUD_WORKERS, HEATMAP_TIMEOUT, NEURAL_TIMEOUT,
+    CLOUD_TIMEOUT, FALLBACK_SCORE, MODEL_VERSION, CACHE_DIR, CACHE_MEMORY_ENTRIES,
+    CACHE_TTL, CACHE_MAX_DISK_MB, JOB_QUEUE_SIZE, JOB_WORKERS,
+    JOB_RESULT_TTL, WARMUP_MODELS, SCRATCH_DIR, UPLOAD_SPOOL_MAX_MB, KEYFRAME_JPEG_QUALITY,
+    KEYFRAME_MAX_SIDE, GEMINI_API_BASE, GEMINI_UPLOAD_WORKERS, GEMINI_PROCESSING_DEADLINE,
+    PIPELINE_QUEUE_SIZE, OUTPUT_PROFILES, OUTPUT_DIR, OUTPUT_MAX_AGE, OUTPUT_MAX_MB,
+    OUTPUT_SWEEP_INTERVAL, OUTPUT_HTTP_MAX_AGE, MODEL_SERVER_ADDRESS, MODEL_SERVER_AUTHKEY,
+    HEATMAP_OUTPUT_PROFILE, EARLY_STOP, ENSEMBLE_WEIGHTS, ENSEMBLE_POLICY, CASCADE_TIERS,
+    CASCADE_UNCERTAIN_BAND, HEATMAP_FRAME_BUDGET, KEYFRAME_BUDGET
+)
+from gemini_client import GeminiFilesClient
+from upload_stream import receive_form, form_flag
+from model_registry import ModelRegistry
+from model_server import ModelClient
+import micro_batcher
+from early_stop import EngineCancelled, check_cancelled, settled_verdict
+import telemetry
+from telemetry import span, trace_request
+from result_cache import ResultCache
+from job_queue import Job, JobManager, JobQueueFull
+from video_output import probe_codecs, output_size
+from output_store import OutputFiles, OutputJanitor
+from heatmap_stream import STREAM_FORMATS, FrameRelay, StreamCancelled, sse_event, frame_payload
 
 # --- CONFIGURATION (AI STUDIO) ---
 PORT = 8000
@@ -21,33 +50,66 @@ if not API_KEY:
     raise ValueError("❌ CRITICAL ERROR: GOOGLE_API_KEY is missing. Check your .env file!")
 
 print(f"--- TruthLens Backend Starting (SOTA Mode) ---")
-print(f"Configuring Gemini API...")
-
-genai.configure(api_key=API_KEY)
 
 # --- MODEL SETUP ---
 # Switching to Best Available Pro model (Dynamically Verified)
 model_name = "gemini-2.5-pro"
-print(f"Loading SOTA Model: {model_name}...")
 
 # Grounding via Google Search
 tools_config = [
     {"google_search": {}}
 ]
 
-try:
-    print("Attempting to initialize with Google Search Grounding...")
-    model = genai.GenerativeModel(model_name, tools=tools_config)
-    print(f"SUCCESS: Model '{model_name}' initialized with Grounding.")
-except Exception as e:
-    print(f"WARNING: Grounding initialization failed: {e}")
-    print("Retrying WITHOUT Google Search (Basic Mode)...")
+def load_gemini():
+    print(f"Configuring Gemini API...")
+    genai.configure(api_key=API_KEY)
+    print(f"Loading SOTA Model: {model_name}...")
     try:
+        print("Attempting to initialize with Google Search Grounding...")
+        model = genai.GenerativeModel(model_name, tools=tools_config)
+        print(f"SUCCESS: Model '{model_name}' initialized with Grounding.")
+    except Exception as e:
+        print(f"WARNING: Grounding initialization failed: {e}")
+        print("Retrying WITHOUT Google Search (Basic Mode)...")
         model = genai.GenerativeModel(model_name) # No tools
         print(f"SUCCESS: Model '{model_name}' initialized (Basic Mode).")
-    except Exception as e2:
-         print(f"CRITICAL ERROR initializing model (Basic Mode): {e2}")
-         model = None
+    return model
+
+def load_heatmap_engine():
+    import heatmap_engine
+    if model_server:
+        # Fails (and is retried on next use) until the server is up with the model loaded
+        if not model_server.ping()["heatmap"]:
+            raise RuntimeError("ResNet18 not loaded on the model server.")
+        heatmap_engine.use_model_server(model_server)
+        return heatmap_engine
+    if heatmap_engine.load_model() is None:
+        raise RuntimeError("ResNet18 could not be loaded.")
+    return heatmap_engine
+
+def load_neural_engine():
+    import local_engine1
+    if model_server:
+        if not model_server.ping()["neural"]:
+            raise RuntimeError("Neural classifier not loaded on the model server.")
+        local_engine1.use_model_server(model_server)
+        return local_engine1
+    if local_engine1.load_classifier() is None:
+        raise RuntimeError("Neural classifier could not be loaded.")
+    return local_engine1
+
+# Optional shared model server: workers stay light and the weights are loaded once per node
+model_server = ModelClient(MODEL_SERVER_ADDRESS, MODEL_SERVER_AUTHKEY) if MODEL_SERVER_ADDRESS else None
+
+# Gemini Files API client (pooled, parallel uploads; base URL overridable for a local stand-in)
+gemini_files = GeminiFilesClient(API_KEY, base_url=GEMINI_API_BASE, max_workers=GEMINI_UPLOAD_WORKERS)
+
+# Engines load on first use (or in the background warm-up below), so the
+# server starts answering immediately instead of after tens of seconds.
+models = ModelRegistry()
+models.register("gemini", load_gemini)
+models.register("heatmap", load_heatmap_engine)
+models.register("neural", load_neural_engine)
 
 app = FastAPI()
 
@@ -60,114 +122,260 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/generated", StaticFiles(directory="generated"), name="generated")
+# Generated heatmaps: Range requests for seeking, Cache-Control, never half-written files
+os.makedirs(OUTPUT_DIR, exist_ok=True)
+app.mount("/generated", OutputFiles(directory=OUTPUT_DIR, max_age=OUTPUT_HTTP_MAX_AGE), name="generated")
+
+# Keeps generated/ bounded by age and total size
+output_janitor = OutputJanitor(
+    OUTPUT_DIR, max_age=OUTPUT_MAX_AGE, max_bytes=OUTPUT_MAX_MB * 1024 * 1024, interval=OUTPUT_SWEEP_INTERVAL
+)
 
 @app.get("/")
 def home():
     return {"status": "TruthLens Backend is Running (SOTA Mode)", "model": model_name}
 
+@app.get("/health")
+def health():
+    engines = models.status()
+    return {
+        "ready": all(e["state"] == "ready" for e in engines.values()),
+        "engines": engines,
+        "codecs": probe_codecs()
+    }
+
+@app.get("/health/ready")
+def health_ready():
+    """Readiness probe for load balancers: 503 until every engine is loaded."""
+    body = health()
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.on_event("startup")
+async def warm_up_models():
+    if WARMUP_MODELS:
+        models.warm_up()
+
+@app.on_event("startup")
+async def start_output_janitor():
+    output_janitor.start()
+
+@app.get("/batching/stats")
+def batching_stats():
+    """Per-model micro-batcher metrics: batch sizes, queue wait, utilization."""
+    return micro_batcher.all_stats()
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape target: per-stage latency histograms + micro-batcher counters."""
+    return PlainTextResponse(
+        telemetry.render_metrics(micro_batcher.all_batchers()),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/outputs/stats")
+def output_stats():
+    return output_janitor.stats()
+
+@app.on_event("startup")
+async def probe_video_codecs():
+    # Once per process, instead of trial-and-error VideoWriters on every request
+    await run_in_threadpool(probe_codecs)
+
+# --- RESULT CACHE (Repeated uploads skip the whole pipeline) ---
+result_cache = ResultCache(
+    CACHE_DIR,
+    model_version=f"{MODEL_VERSION}|{model_name}",
+    memory_entries=CACHE_MEMORY_ENTRIES,
+    ttl_seconds=CACHE_TTL,
+    max_disk_bytes=CACHE_MAX_DISK_MB * 1024 * 1024
+)
+
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
+
+async def save_upload(request):
+    """
+    Streams the multipart body into memory / scratch space (hashed and sniffed
+    on the way in). Returns (upload, form fields). Endpoints take the raw
+    Request (no UploadFile / Form params), so nothing is read before this.
+    """
+    with span("upload_save"):
+        return await receive_form(request, SCRATCH_DIR, UPLOAD_SPOOL_MAX_MB * 1024 * 1024)
+
+def with_timings(response, trace, enabled):
+    """Adds the request's per-stage timing breakdown (on a copy: cached dicts are shared)."""
+    if not enabled or not isinstance(response, dict):
+        return response
+    return dict(response, timings=trace.breakdown())
+
+def heatmap_output_name(content_digest, early_stop=False, profile=HEATMAP_OUTPUT_PROFILE):
+    """
+    Content-addressed name for a heatmap video (upload digest + model version +
+    output profile + early stop), so cached video_urls stay valid, an
+    early-stopped (shorter) video never overwrites the full one, and
+    concurrent requests never share a file.
+    """
+    variant = f"heatmap|{profile}{'+early' if early_stop else ''}"
+    return f"heatmap_{result_cache.key(content_digest, variant)[:16]}"
+
 import cv2
+from frame_source import FrameSource, encode_jpeg
+from frame_sampler import sampled_fps
 
 # --- HELPER: HD FRAME EXTRACTION ---
-def extract_hd_frames(video_path, output_folder, count=5):
-    """Extracts 5 HD frames at 10%, 30%, 50%, 70%, 90% intervals."""
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
-    
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print("Error opening video file for frame extraction.")
-        return []
-
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    duration = total_frames / fps if fps > 0 else 0
+def extract_hd_frames(video_path, count=KEYFRAME_BUDGET, frames=None, quality=KEYFRAME_JPEG_QUALITY, max_side=KEYFRAME_MAX_SIDE):
+    """
+    Extracts `count` HD frames spread over the video (one per scene where there
+    are cuts) as in-memory JPEGs.
+    The frames come from one forward decode pass (no seeking, no temp files).
+    frames: optional pre-decoded keyframes (FrameSource "keyframes" plan);
+    when given, the video is not opened again.
+    Returns a list of (name, jpeg_bytes).
+    """
+    if frames is None:
+        try:
+            source = FrameSource(video_path)
+        except ValueError:
+            print("Error opening video file for frame extraction.")
+            return []
+        source.request_sampled("keyframes", count, max_side)
+        print(f"Extracting {count} HD Frames from {source.duration:.2f}s video...")
+        frames = source.frames("keyframes")
+
+    extracted = []
+    for i, frame in enumerate(frames[:count]):
+        extracted.append((f"frame_{i}.jpg", encode_jpeg(frame, quality=quality, max_side=max_side)))
     
-    # Calculate timestamps for 10%, 30%, ... 90%
-    intervals = [0.1, 0.3, 0.5, 0.7, 0.9]
-    extracted_paths = []
+    print(f"Extracted {len(extracted)} frames.")
+    return extracted
+
+# Implement Dual Engine (resolved through the registry on first call)
+def analyze_video_neural(*args, **kwargs):
+    return models.get("neural").analyze_video_neural(*args, **kwargs)
+
+def process_video_heatmap(*args, **kwargs):
+    return models.get("heatmap").process_video_heatmap(*args, **kwargs)
 
-    print(f"Extracting {count} HD Frames from {duration:.2f}s video...")
+# --- SINGLE ENGINE PIPELINE (Shared by /analyze and /jobs) ---
+SINGLE_ENGINES = {"local": "neural", "gradcam": "heatmap", "cloud": "cloud"}  # Job engine key per mode
 
-    for i, ratio in enumerate(intervals):
-        target_frame = int(total_frames * ratio)
-        cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
-        ret, frame = cap.read()
+async def run_single(mode, upload, job=None, early_stop=False):
+    key = SINGLE_ENGINES.get(mode)
+    if job and key:
+        job.update_engine(key, status="running")
+    try:
+        response = await _run_single(mode, upload, job, early_stop)
+    except Exception:
+        if job and key:
+            job.update_engine(key, status="failed", progress=1.0)
+        raise
+    if job and key and response is not None:
+        failed = response.get("verdict_title") == "FORMAT ERROR"
+        job.update_engine(key, status="failed" if failed else "done", progress=1.0,
+                          score=response.get("deepfake_score"))
+    return response
+
+async def _run_single(mode, upload, job, early_stop):
+    original_filename = upload.filename
+    content_digest = upload.digest
+    early_stop = early_stop and mode in ("local", "gradcam")
+    cache_key = result_cache.key(content_digest, f"{mode}+early" if early_stop else mode)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print(f"[CACHE] Hit for {original_filename} (Mode: {mode})")
+        return cached
+
+    # Engines need a real file; small in-memory uploads are written out only now
+    temp_filename = await run_in_threadpool(lambda: upload.path)
+
+    # --- BRANCH 1: LOCAL ENGINE (NEURAL CORE) ---
+    if mode == "local":
+        print("[INFO] routing to LOCAL NEURAL ENGINE (RTX 4050)...")
+        result = await run_in_threadpool(
+            analyze_video_neural, temp_filename,
+            progress=job.engine_progress(SINGLE_ENGINES[mode]) if job else None,
+            early_stop=early_stop
+        )
         
-        if ret:
-            # Save as high quality JPEG
-            frame_name = f"frame_{i}_{int(target_frame)}.jpg"
-            frame_path = os.path.join(output_folder, frame_name)
-            cv2.imwrite(frame_path, frame, [cv2.IMWRITE_JPEG_QUALITY, 100])
-            extracted_paths.append(frame_path)
-    
-    cap.release()
-    print(f"Extracted {len(extracted_paths)} frames.")
-    return extracted_paths
+        # Formulate response format matching the cloud one
+        response = {
+            "confidence_score": result.get("deepfake_score", 0), # Mapped for Frontend
+            "deepfake_score": result.get("deepfake_score", 0),   # Standardized Key
+            "verdict_title": result.get("label", "UNCERTAIN"),
+            "visual_evidence": [f"Neural Risk Score: {result.get('deepfake_score', 0)}%"],
+            "audio_evidence": ["N/A (Local Mode)"],
+            "fact_check_analysis": "Local Analysis Only. No external context."
+        }
+        result_cache.put(cache_key, response)
+        return response
 
-# Implement Dual Engine
-from local_engine1 import analyze_video_neural
-from heatmap_engine import process_video_heatmap
+    # --- BRANCH 3: GRAD-CAM ENGINE ---
+    if mode == "gradcam":
+        print("[INFO] routing to GRAD-CAM ENGINE...")
+        
+        # Process (New engine handles output path internally or returns it)
+        # The new process_video_heatmap returns a DICT: {"deepfake_score": ..., "video_path": ...}
+        engine_output = await run_in_threadpool(
+            process_video_heatmap, temp_filename,
+            progress=job.engine_progress(SINGLE_ENGINES[mode]) if job else None,
+            output_name=heatmap_output_name(content_digest, early_stop),
+            early_stop=early_stop
+        )
+        
+        output_video_path = engine_output.get("video_path")
+        score = engine_output.get("deepfake_score", 95.0)
+        
+        # Determine extension from the actual output path
+        filename = os.path.basename(output_video_path)
+        
+        # Formulate response
+        response = {
+            "confidence_score": score, # Mapped for Frontend
+            "deepfake_score": score,   # Standardized Key
+            "verdict_title": "EXPLAINABLE AI GENERATED",
+            "visual_evidence": [f"Heatmap Intensity Score: {score}%", f"Format: {filename.split('.')[-1]}"],
+            "audio_evidence": ["N/A"],
+            "fact_check_analysis": "Heatmap available below.",
+            "video_url": f"http://127.0.0.1:5000/generated/{filename}",
+            "is_demo_mode": False
+        }
+        result_cache.put(cache_key, response, video_file=output_video_path)
+        return response
+
+    # --- BRANCH 2: CLOUD ENGINE (Gemini) ---
+    if mode == "cloud":
+        response = await run_in_threadpool(
+            analyze_gemini, temp_filename, original_filename,
+            progress=job.engine_progress(SINGLE_ENGINES[mode]) if job else None
+        )
+        if response.get("verdict_title") != "FORMAT ERROR":
+            result_cache.put(cache_key, response)
+        return response
 
 @app.post("/analyze")
-async def analyze_video(
-    file: UploadFile = File(...),
-    mode: str = Form("cloud") # Default to cloud if not specified
-):
-    temp_filename = f"temp_{file.filename}"
-    frame_folder = f"frames_{int(time.time())}"
+async def analyze_video(request: Request):
+    """
+    multipart/form-data: file, mode ("cloud" by default), timings (add a
+    per-stage latency breakdown), early_stop (stop sampling frames once the
+    verdict is clear).
+    """
+    upload = None
     
     try:
-        print(f"[INFO] Receiving video: {file.filename} (Mode: {mode})")
-        
-        # Save upload to disk
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        # --- BRANCH 1: LOCAL ENGINE (NEURAL CORE) ---
-        if mode == "local":
-            print("[INFO] routing to LOCAL NEURAL ENGINE (RTX 4050)...")
-            result = analyze_video_neural(temp_filename)
-            
-            # Formulate response format matching the cloud one
-            return {
-                "confidence_score": result.get("deepfake_score", 0), # Mapped for Frontend
-                "deepfake_score": result.get("deepfake_score", 0),   # Standardized Key
-                "verdict_title": result.get("label", "UNCERTAIN"),
-                "visual_evidence": [f"Neural Risk Score: {result.get('deepfake_score', 0)}%"],
-                "audio_evidence": ["N/A (Local Mode)"],
-                "fact_check_analysis": "Local Analysis Only. No external context."
-            }
-
-        # --- BRANCH 3: GRAD-CAM ENGINE ---
-        if mode == "gradcam":
-            print("[INFO] routing to GRAD-CAM ENGINE...")
-            
-            # Process (New engine handles output path internally or returns it)
-            # The new process_video_heatmap returns a DICT: {"deepfake_score": ..., "video_path": ...}
-            engine_output = process_video_heatmap(temp_filename)
-            
-            output_video_path = engine_output.get("video_path")
-            score = engine_output.get("deepfake_score", 95.0)
-            
-            # Determine extension from the actual output path
-            filename = os.path.basename(output_video_path)
-            
-            # Formulate response
-            return {
-                "confidence_score": score, # Mapped for Frontend
-                "deepfake_score": score,   # Standardized Key
-                "verdict_title": "EXPLAINABLE AI GENERATED",
-                "visual_evidence": [f"Heatmap Intensity Score: {score}%", f"Format: {filename.split('.')[-1]}"],
-                "audio_evidence": ["N/A"],
-                "fact_check_analysis": "Heatmap available below.",
-                "video_url": f"http://127.0.0.1:5000/generated/{filename}",
-                "is_demo_mode": False
-            }
-
-        # --- BRANCH 2: CLOUD ENGINE (Gemini) ---
-        if mode == "cloud":
-            return analyze_gemini(temp_filename, file.filename)
+        with trace_request() as trace:
+            # Stream the upload (hashed and type-checked while it arrives)
+            upload, form = await save_upload(request)
+            mode = form.get("mode", "cloud") # Default to cloud if not specified
+            timings = form_flag(form, "timings")
+            early_stop = form_flag(form, "early_stop", EARLY_STOP)
+            print(f"[INFO] Receiving video: {upload.filename} (Mode: {mode})")
+            with span("total", mode if mode in JOB_ENGINES else "unknown"):
+                response = await run_single(mode, upload, early_stop=early_stop)
+        return with_timings(response, trace, timings)
+
+    except HTTPException:
+        raise
 
     except Exception as e:
         print(f"Error: {str(e)}")
@@ -182,50 +390,48 @@ async def analyze_video(
         }
     
     finally:
-        # Cleanup (Only delete if NOT in ensemble mode, handled by wrapper if needed)
-        # However, for simple /analyze, we delete here.
-        # But if we call this from ensemble, we might need file later.
-        # Actually, ensemble will have its own file handling.
-        
-        if os.path.exists(temp_filename):
-            try:
-                os.remove(temp_filename)
-            except:
-                pass
-        if os.path.exists(frame_folder):
-            try:
-                shutil.rmtree(frame_folder)
-            except:
-                pass
+        if upload:
+            upload.close()
 
 # --- HELPER: GEMINI ANALYSIS ---
-def analyze_gemini(temp_filename, original_filename):
+def analyze_gemini(temp_filename, original_filename, keyframes=None, progress=None, cancel=None):
+    """
+    progress: optional callback(done, total) over the 4 stages (frames, upload, processing, verdict).
+    cancel: optional threading.Event, checked between stages (raises EngineCancelled once set).
+    """
     print(f"[INFO] Uploading Video to Gemini...")
-    frame_folder = f"frames_{int(time.time())}_gemini"
-    extracted_frames = extract_hd_frames(temp_filename, frame_folder, count=5)
+    with span("keyframes", "cloud"):
+        extracted_frames = extract_hd_frames(temp_filename, frames=keyframes)
+    report = progress or (lambda done, total: None)
+    report(1, 4)
+    check_cancelled(cancel, "Cloud")
     
-    try:
-        video_file = genai.upload_file(path=temp_filename, display_name=original_filename)
+    # Upload Video + Frames to Gemini concurrently (one pooled HTTP session)
+    video_mime = mimetypes.guess_type(temp_filename)[0] or "video/mp4"
+    print(f"[INFO] Uploading Video + {len(extracted_frames)} Frames to Gemini...")
+    with span("gemini_upload", "cloud"):
+        uploaded = gemini_files.upload_many(
+            [(temp_filename, video_mime, original_filename)] +
+            [(jpeg_bytes, "image/jpeg", frame_name) for frame_name, jpeg_bytes in extracted_frames]
+        )
+    video_file, uploaded_images = uploaded[0], uploaded[1:]
+
+    report(2, 4)
+
+    # Wait for VIDEO processing (exponential backoff, hard deadline)
+    print(f"Waiting for video processing...")
+    with span("gemini_processing_wait", "cloud"):
+        video_file = gemini_files.wait_until_active(video_file, deadline=GEMINI_PROCESSING_DEADLINE, cancel=cancel)
+        uploaded_images = [
+            gemini_files.wait_until_active(image, deadline=GEMINI_PROCESSING_DEADLINE, cancel=cancel)
+            for image in uploaded_images
+        ]
         
-        # Upload Frames to Gemini
-        uploaded_images = []
-        print(f"[INFO] Uploading {len(extracted_frames)} Frames to Gemini...")
-        for frame_path in extracted_frames:
-            img_file = genai.upload_file(path=frame_path, display_name=os.path.basename(frame_path))
-            uploaded_images.append(img_file)
-
-        # Wait for VIDEO processing
-        print(f"Waiting for video processing...")
-        while video_file.state.name == "PROCESSING":
-            time.sleep(2)
-            video_file = genai.get_file(video_file.name)
-            
-        if video_file.state.name == "FAILED":
-            raise ValueError("Video processing failed on Google server.")
-            
-        print(f"Video ready: {video_file.uri}")
-
-        prompt = """
+    print(f"Video ready: {video_file['uri']}")
+    report(3, 4)
+    check_cancelled(cancel, "Cloud")
+
+    prompt = """
 🚨 SYSTEM ALERT: FORENSIC ANALYSIS MODE ACTIVATED (Protocol: ZERO-TRUST) 🚨
 ROLE: You are 'TruthLens Omega', a Tier-1 Digital Media Forensic Examiner for the Department of Defense.
 OBJECTIVE: Conduct a ruthless, frame-by-frame analysis of the provided VIDEO and 5 HD KEYFRAMES to detect Generative AI manipulation (Sora, Kling, Luma, Runway).
@@ -285,118 +491,470 @@ OUTPUT FORMAT (JSON ONLY):
 }
 """
 
-        print(f"Sending to {model_name} (1 Video + {len(uploaded_images)} Images)...")
-        
-        # Combine inputs: Prompt + Video + Images
-        input_content = [prompt, video_file] + uploaded_images
+    print(f"Sending to {model_name} (1 Video + {len(uploaded_images)} Images)...")
+    
+    # Combine inputs: Prompt + Video + Images
+    input_content = [prompt, gemini_files.as_part(video_file)] + [gemini_files.as_part(image) for image in uploaded_images]
 
-        response = model.generate_content(
+    with span("gemini_generate", "cloud"):
+        response = models.get("gemini").generate_content(
             input_content,
             generation_config={"response_mime_type": "application/json"}
         )
-        
-        print("Analysis Complete!")
-        
-        # Parse text response to JSON dict
+    
+    print("Analysis Complete!")
+    report(4, 4)
+    
+    # Parse text response to JSON dict
+    try:
+        data = json.loads(response.text)
+        # Ensure standardized key
+        if "deepfake_score" not in data:
+            data["deepfake_score"] = data.get("confidence_score", 0)
+        return data
+    except json.JSONDecodeError:
+        print("Model failed to return valid JSON. Returning raw text for debugging.")
+        return {
+            "confidence_score": 0,
+            "deepfake_score": 0,
+            "verdict_title": "FORMAT ERROR",
+            "visual_evidence": ["Model returned invalid JSON format."],
+            "audio_evidence": [],
+            "fact_check_analysis": response.text
+        }
+
+# --- ENSEMBLE EXECUTION ---
+# Local engines share one bounded pool; Gemini upload/poll gets its own so a
+# slow cloud round-trip never starves the local engines (or vice versa).
+ENGINE_POOL = ThreadPoolExecutor(max_workers=ENGINE_WORKERS, thread_name_prefix="engine")
+CLOUD_POOL = ThreadPoolExecutor(max_workers=CLOUD_WORKERS, thread_name_prefix="cloud")
+
+async def run_engine(name, fn, *args, timeout=None, pool=ENGINE_POOL, fallback=None, job=None, hold=None, **kwargs):
+    """
+    Runs a blocking engine off the event loop; returns `fallback` on error/timeout.
+    The engine gets its own `cancel` Event, set on timeout or when this task is
+    cancelled, so its thread stops at the next check instead of holding a pool
+    worker. hold: upload that must stay on disk until that thread has exited.
+    """
+    key = name.lower()
+    cancel = threading.Event()
+    kwargs["cancel"] = cancel
+    if job:
+        job.update_engine(key, status="running")
+        kwargs["progress"] = job.engine_progress(key)
+    # Run in a copy of our context so the engine's spans land in this request's trace
+    worker = pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+    if hold is not None:
+        hold.retain(worker)
+    try:
+        with span("total", key):
+            result = await asyncio.wait_for(asyncio.wrap_future(worker), timeout=timeout)
+        if result is None:
+            raise ValueError(f"{name} engine returned no result.")
+        if job:
+            job.update_engine(key, status="done", progress=1.0, score=result.get("deepfake_score"))
+        return result
+    except asyncio.TimeoutError:
+        cancel.set()
+        print(f" {name} Timed Out after {timeout}s")
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+    except Exception as e:
+        print(f" {name} Failed: {e}")
+    fallback = dict(fallback or {"deepfake_score": FALLBACK_SCORE})
+    fallback["failed"] = True
+    if job:
+        job.update_engine(key, status="failed", progress=1.0, score=fallback["deepfake_score"])
+    return fallback
+
+# --- ENSEMBLE PIPELINE (Shared by /analyze_ensemble and /jobs) ---
+ENSEMBLE_POLICIES = ("cascade", "parallel")
+ENGINE_PLANS = {"heatmap": "heatmap", "neural": "neural", "cloud": "keyframes"}  # FrameSource plan per engine
+ENGINE_LABELS = {"cloud": "Cloud Confidence", "heatmap": "Visual Analysis", "neural": "Neural Pattern"}
+
+def ensemble_tiers(policy):
+    """cascade: CASCADE_TIERS, cheapest first. parallel: every weighted engine in one tier."""
+    if policy == "parallel":
+        return [[name for name in ENSEMBLE_WEIGHTS if name in ENGINE_PLANS]]
+    tiers = [[name for name in tier if name in ENSEMBLE_WEIGHTS and name in ENGINE_PLANS] for tier in CASCADE_TIERS]
+    return [tier for tier in tiers if tier]
+
+def ensemble_cache_mode(policy, early_stop):
+    """Cache key mode: verdicts depend on the policy, weights and band, so all of them are in it."""
+    weights = ",".join(f"{name}={weight:.3f}" for name, weight in sorted(ENSEMBLE_WEIGHTS.items()))
+    mode = f"ensemble|{policy}|{weights}"
+    if policy == "cascade":
+        mode += f"|{ensemble_tiers(policy)}|{CASCADE_UNCERTAIN_BAND}"
+    return mode + ("+early" if early_stop else "")
+
+async def gather_engines(tasks, weights, early_stop=False, job=None, known=None, on_done=None):
+    """
+    Awaits {name: task} and returns ({name: result}, [skipped names]). With
+    early_stop, engines still running are cancelled as soon as the finished
+    ones (plus `known` results from earlier tiers) settle the weighted verdict
+    (see early_stop.settled_verdict).
+    on_done: optional callback(name), called once per engine as it finishes or is skipped.
+    """
+    results = {}
+    pending = set(tasks.values())
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for name, task in tasks.items():
+            if task in done:
+                results[name] = task.result()
+                if on_done:
+                    on_done(name)
+        if not (early_stop and pending):
+            continue
+        finished = dict(known or {}, **results)
+        scores = {name: res.get("deepfake_score", FALLBACK_SCORE) for name, res in finished.items()}
+        verdict, _ = settled_verdict(scores, weights)
+        if verdict:
+            skipped = [name for name in tasks if name not in results]
+            print(f" Verdict settled ({verdict}) without: {', '.join(skipped)}")
+            for name in skipped:
+                tasks[name].cancel()
+                if job:
+                    job.update_engine(name, status="skipped", progress=1.0)
+                if on_done:
+                    on_done(name)
+            return results, skipped
+    return results, []
+
+def escalation(tier_number, tier_results, scores):
+    """
+    After a cascade tier: (True, reason) to run the next tier, (False, reason)
+    to stop here. Escalates while the combined score is inside the uncertain
+    band (or the whole tier failed), unless the verdict can no longer change.
+    """
+    low, high = CASCADE_UNCERTAIN_BAND
+    band = f"uncertain band [{low:g}, {high:g}]"
+    verdict, score = settled_verdict(scores, ENSEMBLE_WEIGHTS)
+    if all(res.get("failed") for res in tier_results.values()):
+        return True, f"tier {tier_number} failed"
+    if verdict:
+        return False, f"verdict settled ({verdict}) after tier {tier_number}"
+    if low <= score <= high:
+        return True, f"score {score:.1f} inside {band}"
+    return False, f"score {score:.1f} {'above' if score > high else 'below'} {band}"
+
+async def run_ensemble(upload, job=None, early_stop=False, policy=ENSEMBLE_POLICY):
+    """
+    Runs the engines tier by tier (cascade: cheap local engines first, the
+    cloud only while the combined score is uncertain) or all at once
+    (parallel). The response reports which tiers ran and why.
+    """
+    original_filename = upload.filename
+    content_digest = upload.digest
+    cache_key = result_cache.key(content_digest, ensemble_cache_mode(policy, early_stop))
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print(f"[CACHE] Hit for {original_filename} (Ensemble)")
+        return cached
+
+    temp_filename = await run_in_threadpool(lambda: upload.path)
+    loop = asyncio.get_running_loop()
+    tiers = ensemble_tiers(policy)
+
+    source = None
+    try:
+        # 0. DECODE ONCE PER TIER, SHARE FRAMES ACROSS ITS ENGINES
+        # (later tiers only decode if the cascade actually gets there)
         try:
-            data = json.loads(response.text)
-            # Ensure standardized key
-            if "deepfake_score" not in data:
-                data["deepfake_score"] = data.get("confidence_score", 0)
-            return data
-        except json.JSONDecodeError:
-            print("Model failed to return valid JSON. Returning raw text for debugging.")
-            return {
-                "confidence_score": 0,
-                "deepfake_score": 0,
-                "verdict_title": "FORMAT ERROR",
-                "visual_evidence": ["Model returned invalid JSON format."],
-                "audio_evidence": [],
-                "fact_check_analysis": response.text
-            }
+            source = await loop.run_in_executor(ENGINE_POOL, FrameSource, temp_filename)
+        except Exception as e:
+            print(f" Frame Source Failed: {e}")
+            source = None
 
-    finally:
-        if os.path.exists(frame_folder):
+        async def frames_for(tier):
+            nonlocal source
+            if source is None:
+                return {}
             try:
-                shutil.rmtree(frame_folder)
-            except:
-                pass
+                source.request_defaults([ENGINE_PLANS[name] for name in tier])
+                await loop.run_in_executor(ENGINE_POOL, contextvars.copy_context().run, source.decode)
+            except Exception as e:
+                print(f" Frame Source Failed: {e}")
+                return {}
+            return {name: source.frames(ENGINE_PLANS[name]) for name in tier}
+
+        def release_frames(name):
+            # The engine is done (or skipped): its frames are not needed for later tiers
+            if source is not None:
+                source.release_plan(ENGINE_PLANS[name])
+
+        def start(name, frames):
+            if name == "heatmap":
+                return asyncio.create_task(run_engine(
+                    "Heatmap", process_video_heatmap, temp_filename,
+                    frames=frames or None, fps=source.plan_fps("heatmap") if frames else None,
+                    output_name=heatmap_output_name(content_digest, early_stop),
+                    early_stop=early_stop,
+                    timeout=HEATMAP_TIMEOUT, job=job, hold=upload,
+                    fallback={"deepfake_score": FALLBACK_SCORE, "video_path": ""}
+                ))
+            if name == "neural":
+                return asyncio.create_task(run_engine(
+                    "Neural", analyze_video_neural, temp_filename,
+                    frames=frames or None, early_stop=early_stop,
+                    timeout=NEURAL_TIMEOUT, job=job, hold=upload
+                ))
+            return asyncio.create_task(run_engine(
+                "Cloud", analyze_gemini, temp_filename, original_filename,
+                keyframes=frames or None,
+                timeout=CLOUD_TIMEOUT, pool=CLOUD_POOL, job=job, hold=upload
+            ))
+
+        # 1-N. TIERS (engines within a tier run in parallel)
+        results, skipped, tier_report = {}, [], []
+        run_next, reason = True, "first tier" if policy == "cascade" else "parallel policy"
+        for number, tier in enumerate(tiers, start=1):
+            if not run_next:
+                tier_report.append({"tier": number, "engines": tier, "ran": False, "reason": reason})
+                skipped += tier
+                for name in tier:
+                    if job:
+                        job.update_engine(name, status="skipped", progress=1.0)
+                continue
+
+            print(f" [Tier {number}/{len(tiers)}] Running {', '.join(tier)} ({reason})...")
+            frames = await frames_for(tier)
+            tasks = {name: start(name, frames.pop(name, None)) for name in tier}
+            tier_results, tier_skipped = await gather_engines(
+                tasks, ENSEMBLE_WEIGHTS, early_stop=early_stop, job=job, known=results, on_done=release_frames
+            )
+            results.update(tier_results)
+            skipped += tier_skipped
+
+            scores = {name: res.get("deepfake_score", FALLBACK_SCORE) for name, res in results.items()}
+            _, score = settled_verdict(scores, ENSEMBLE_WEIGHTS)
+            tier_report.append({"tier": number, "engines": tier, "ran": True, "reason": reason, "score": round(score, 2)})
+            run_next, reason = escalation(number, tier_results, scores)
+    finally:
+        if source:
+            source.release()
+
+    # CALCULATE WEIGHTED SCORE (renormalized over the engines that ran)
+    scores = {name: res.get("deepfake_score", FALLBACK_SCORE) for name, res in results.items()}
+    _, final_score = settled_verdict(scores, ENSEMBLE_WEIGHTS)
+
+    print(f"--- SCORES ({policy}) ---")
+    for name, weight in ENSEMBLE_WEIGHTS.items():
+        print(f"{name.capitalize()} ({weight:.0%}): {scores[name] if name in scores else 'skipped'}")
+    print(f"FINAL: {final_score}")
+
+    video_path = results.get("heatmap", {}).get("video_path", "")
+    filename = os.path.basename(video_path) if video_path else ""
+
+    def rounded(name):
+        return round(scores[name], 2) if name in scores else None
+
+    response = {
+        "final_verdict": round(final_score, 2),
+        "breakdown": {
+            "api": rounded("cloud"),
+            "heatmap": rounded("heatmap"),
+            "neural": rounded("neural")
+        },
+        "video_url": f"http://127.0.0.1:5000/generated/{filename}" if filename else None,
+        "verdict_title": "MASTER SCAN COMPLETE",
+        "visual_evidence": [f"Aggregated Threat Level: {round(final_score, 2)}%"] + [
+            f"{label}: {scores[name]}%" if name in scores else f"{label}: not run"
+            for name, label in ENGINE_LABELS.items()
+        ],
+        "audio_evidence": ["Ensemble Analysis"],
+        "fact_check_analysis": "Cross-verification complete.",
+        "policy": policy,
+        "tiers": tier_report,
+        "skipped_engines": skipped
+    }
+    if early_stop:
+        response["frames_analyzed"] = {
+            name: res["frames_analyzed"] for name, res in results.items() if "frames_analyzed" in res
+        }
+
+    # Degraded verdicts (an engine fell back to 50.0) are not cached
+    if not any(res.get("failed") for res in results.values()):
+        result_cache.put(cache_key, response, video_file=video_path or None)
+    return response
 
 @app.post("/analyze_ensemble")
-async def analyze_ensemble(file: UploadFile = File(...)):
+async def analyze_ensemble(request: Request):
+    """
+    multipart/form-data: file, timings, early_stop (stop engines and skip slow
+    ones once the verdict is clear), policy (cascade = cloud only when the
+    local engines are unsure).
+    """
     print("--- INITIATING MASTER SCAN (ENSEMBLE MODE) ---")
-    temp_filename = f"ensemble_{int(time.time())}_{file.filename}"
+    upload = None
     
     try:
-        # Save upload to disk
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with trace_request() as trace:
+            # Stream the upload (hashed and type-checked while it arrives)
+            upload, form = await save_upload(request)
+            timings = form_flag(form, "timings")
+            early_stop = form_flag(form, "early_stop", EARLY_STOP)
+            policy = form.get("policy", ENSEMBLE_POLICY)
+            if policy not in ENSEMBLE_POLICIES:
+                raise HTTPException(status_code=400, detail=f"Unknown policy '{policy}'. Use one of: {', '.join(ENSEMBLE_POLICIES)}.")
+            with span("total", "ensemble"):
+                response = await run_ensemble(upload, early_stop=early_stop, policy=policy)
+        return with_timings(response, trace, timings)
 
-        # 1. HEATMAP (30% Weight)
-        print(" [1/3] Running Heatmap Engine...")
+    finally:
+        if upload:
+            upload.close()
+
+# --- LIVE HEATMAP STREAM (Server-Sent Events, one event per analysed frame) ---
+@app.post("/stream/heatmap")
+async def stream_heatmap(request: Request):
+    """
+    multipart/form-data: file, format (grid = 7x7 CAM values to colorize
+    client-side, jpeg = rendered overlay), save_video (interactive sessions
+    don't need the MP4 at all).
+    Events: "meta" once, then "frame" per frame {index, score, running_score, cam | jpeg},
+    then "done" {deepfake_score, frames, video_url} or "error" {detail}.
+    """
+    upload, form = await save_upload(request)
+    format = form.get("format", "grid")
+    save_video = form_flag(form, "save_video")
+    if format not in STREAM_FORMATS:
+        upload.close()
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}'. Use one of: {', '.join(STREAM_FORMATS)}.")
+
+    loop = asyncio.get_running_loop()
+    relay = FrameRelay(loop, max_pending=PIPELINE_QUEUE_SIZE)
+
+    def run(cancel=None):
         try:
-            heatmap_res = process_video_heatmap(temp_filename)
+            engine = models.get("heatmap")
+            source = FrameSource(upload.path)
+            preview_size = output_size(source.width, source.height, OUTPUT_PROFILES["preview"]["max_side"])
+            relay.put("meta", {
+                "total": min(HEATMAP_FRAME_BUDGET, source.total_frames),
+                "fps": sampled_fps(source.fps, source.total_frames, HEATMAP_FRAME_BUDGET),
+                "format": format
+            }, cancel)
+
+            scores = []
+            def on_frame(index, frame, heatmap):
+                score = engine.heatmap_score(heatmap)
+                scores.append(score)
+                overlay = engine.overlay_heatmap(frame, heatmap, preview_size) if format == "jpeg" else None
+                relay.put("frame", frame_payload(index, heatmap, score, sum(scores) / len(scores), overlay), cancel)
+
+            result = engine.process_video_heatmap(
+                upload.path, on_frame=on_frame, write_video=save_video,
+                output_name=heatmap_output_name(upload.digest), cancel=cancel
+            )
+            if result is None:
+                raise RuntimeError("Heatmap engine unavailable.")
+
+            done = {"deepfake_score": result["deepfake_score"], "frames": len(scores), "video_url": None}
+            if result["video_path"]:
+                filename = os.path.basename(result["video_path"])
+                done["video_url"] = f"http://127.0.0.1:5000/generated/{filename}"
+            relay.put("done", done, cancel)
+            return done
+        except (StreamCancelled, EngineCancelled):
+            print("[Stream] Client disconnected or timed out, heatmap stopped.")
         except Exception as e:
-            print(f" Heatmap Failed: {e}")
-            heatmap_res = {"deepfake_score": 50.0, "video_path": ""}
+            print(f"[Stream] Heatmap stream failed: {e}")
+            try:
+                relay.put("error", {"detail": str(e)}, cancel)
+            except StreamCancelled:
+                pass
+        return {"deepfake_score": FALLBACK_SCORE, "failed": True}
 
-        # 2. NEURAL (10% Weight)
-        print(" [2/3] Running Neural Engine...")
-        try:
-            neural_res = analyze_video_neural(temp_filename)
-        except Exception as e:
-            print(f" Neural Failed: {e}")
-            neural_res = {"deepfake_score": 50.0}
+    def finished(task):
+        # Timed out (the engine thread is being cancelled): end the stream with an error
+        if not task.cancelled() and task.result().get("failed"):
+            relay.fail(f"Heatmap stream failed or timed out after {HEATMAP_TIMEOUT:g}s.")
 
-        # 3. CLOUD (60% Weight)
-        print(" [3/3] Running Cloud Engine...")
+    async def events():
+        # Same timeout / cancel / upload handling as every other engine run
+        task = asyncio.create_task(run_engine("Heatmap", run, timeout=HEATMAP_TIMEOUT, hold=upload))
+        task.add_done_callback(finished)
         try:
-            cloud_res = analyze_gemini(temp_filename, file.filename)
-        except Exception as e:
-            print(f" Cloud Failed: {e}")
-            cloud_res = {"deepfake_score": 50.0}
-
-        # CALCULATE WEIGHTED SCORE
-        score_cloud = cloud_res.get("deepfake_score", 50.0)
-        score_heatmap = heatmap_res.get("deepfake_score", 50.0)
-        score_neural = neural_res.get("deepfake_score", 50.0)
-
-        final_score = (score_cloud * 0.6) + (score_heatmap * 0.3) + (score_neural * 0.1)
-
-        print(f"--- SCORES ---")
-        print(f"Cloud (60%): {score_cloud}")
-        print(f"Heatmap (30%): {score_heatmap}")
-        print(f"Neural (10%): {score_neural}")
-        print(f"FINAL: {final_score}")
-
-        video_path = heatmap_res.get("video_path", "")
-        filename = os.path.basename(video_path) if video_path else ""
-
-        return {
-            "final_verdict": round(final_score, 2),
-            "breakdown": {
-                "api": round(score_cloud, 2),
-                "heatmap": round(score_heatmap, 2),
-                "neural": round(score_neural, 2)
-            },
-            "video_url": f"http://127.0.0.1:5000/generated/{filename}" if filename else None,
-            "verdict_title": "MASTER SCAN COMPLETE",
-            "visual_evidence": [
-                f"Aggregated Threat Level: {round(final_score, 2)}%",
-                f"Cloud Confidence: {score_cloud}%",
-                f"Visual Analysis: {score_heatmap}%",
-                f"Neural Pattern: {score_neural}%"
-            ],
-            "audio_evidence": ["Ensemble Analysis"],
-            "fact_check_analysis": "Cross-verification complete."
-        }
+            async for event, data in relay.events():
+                yield sse_event(event, data)
+        finally:
+            relay.cancel()  # Client gone (or stream finished): stop the engine thread
+            task.cancel()   # Sets the engine's cancel Event if it is still running
+            upload.close()  # Deleted once the engine thread has exited
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# --- ASYNC JOB API (Submit, then poll GET /jobs/{id}) ---
+ENSEMBLE_MODES = ("master", "ensemble")
+JOB_ENGINES = {
+    "local": ["neural"],
+    "gradcam": ["heatmap"],
+    "cloud": ["cloud"],
+    "master": ["heatmap", "neural", "cloud"],
+    "ensemble": ["heatmap", "neural", "cloud"],
+}
 
+async def run_job(job):
+    upload = job.payload["upload"]
+    try:
+        with trace_request() as trace:
+            if job.mode in ENSEMBLE_MODES:
+                with span("total", "ensemble"):
+                    response = await run_ensemble(
+                        upload, job=job, early_stop=job.payload.get("early_stop", EARLY_STOP),
+                        policy=job.payload.get("policy", ENSEMBLE_POLICY)
+                    )
+            else:
+                with span("total", job.mode):
+                    response = await run_single(
+                        job.mode, upload, job=job, early_stop=job.payload.get("early_stop", EARLY_STOP)
+                    )
+        return with_timings(response, trace, job.payload.get("timings"))
     finally:
-        if os.path.exists(temp_filename):
-            try:
-                os.remove(temp_filename)
-            except:
-                pass
+        upload.close()
+
+job_manager = JobManager(run_job, max_queue=JOB_QUEUE_SIZE, workers=JOB_WORKERS, result_ttl=JOB_RESULT_TTL)
+
+@app.on_event("startup")
+async def start_job_workers():
+    job_manager.start()
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request):
+    """multipart/form-data: file, mode ("master" by default), timings, early_stop, policy."""
+    upload, form = await save_upload(request)
+    mode = form.get("mode", "master")
+    timings = form_flag(form, "timings")
+    early_stop = form_flag(form, "early_stop", EARLY_STOP)
+    policy = form.get("policy", ENSEMBLE_POLICY)
+    if mode not in JOB_ENGINES or policy not in ENSEMBLE_POLICIES:
+        upload.close()
+        raise HTTPException(status_code=400, detail=f"Unknown mode '{mode}'." if mode not in JOB_ENGINES else f"Unknown policy '{policy}'.")
+    job = Job(mode, JOB_ENGINES[mode], payload={
+        "upload": upload, "timings": timings, "early_stop": early_stop, "policy": policy
+    })
+
+    try:
+        job_manager.submit(job)
+    except JobQueueFull as e:
+        upload.close()
+        raise HTTPException(status_code=503, detail=str(e))
+
+    print(f"[Jobs] Queued {job.id} ({upload.filename}, Mode: {mode})")
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return job.to_dict()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,155 @@
+import time
+import queue
+import threading
+
+import telemetry
+
+# Every batcher by name, for /batching/stats and /metrics
+_batchers = {}
+
+
+def all_stats():
+    return {name: batcher.stats() for name, batcher in _batchers.items()}
+
+
+def all_batchers():
+    return dict(_batchers)
+
+
+class _Pending:
+    __slots__ = ("items", "done", "results", "error", "queued_at", "trace")
+
+    def __init__(self, items):
+        self.items = items
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+        self.queued_at = time.monotonic()
+        self.trace = telemetry.current_trace()  # Spans of the shared pass count for every caller
+
+
+class MicroBatcher:
+    """
+    Merges work from concurrent callers into shared model calls.
+
+    submit(items) blocks the calling thread; a single scheduler thread takes
+    the oldest pending request, keeps collecting more until `max_batch` items
+    are queued or `max_wait_ms` has passed, runs fn() on the merged items
+    (in chunks of at most `max_batch`) and hands each caller back its own
+    slice of the results, in order.
+
+    fn: callable(list_of_items) -> list_of_results (same length).
+    """
+
+    def __init__(self, fn, max_batch=32, max_wait_ms=5, name="batcher"):
+        self.fn = fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue = queue.Queue()
+
+        # Metrics
+        self.started = time.monotonic()
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+        self.max_batch_seen = 0
+        self.size_histogram = {}   # Upper bound (power of two) -> number of forward passes
+        self.wait_seconds = 0.0    # Summed over requests: submit() -> start of their batch
+        self.max_wait_seconds = 0.0
+        self.busy_seconds = 0.0    # Time spent inside fn()
+
+        self._thread = threading.Thread(target=self._run, name=f"{name}-scheduler", daemon=True)
+        self._thread.start()
+        _batchers[name] = self
+
+    def submit(self, items):
+        items = list(items)
+        if not items:
+            return []
+        pending = _Pending(items)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.results
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        size = len(batch[0].items)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(pending)
+            size += len(pending.items)
+        return batch
+
+    def _record(self, batch, started, chunk_sizes):
+        for pending in batch:
+            wait = started - pending.queued_at
+            with telemetry.use_traces([pending.trace]):
+                telemetry.record("queue_wait", self.name, wait)
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.requests += len(batch)
+        for size in chunk_sizes:
+            self.batches += 1
+            self.items += size
+            self.max_batch_seen = max(self.max_batch_seen, size)
+            bucket = 1 << (size - 1).bit_length()
+            self.size_histogram[bucket] = self.size_histogram.get(bucket, 0) + 1
+        self.busy_seconds += time.monotonic() - started
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for pending in batch for item in pending.items]
+            started = time.monotonic()
+            chunk_sizes = []
+            try:
+                results = []
+                with telemetry.use_traces([pending.trace for pending in batch]):
+                    for start in range(0, len(items), self.max_batch):
+                        chunk = items[start:start + self.max_batch]
+                        results.extend(self.fn(chunk))
+                        chunk_sizes.append(len(chunk))
+                offset = 0
+                for pending in batch:
+                    pending.results = results[offset:offset + len(pending.items)]
+                    offset += len(pending.items)
+            except Exception as e:
+                for pending in batch:
+                    pending.error = e
+            self._record(batch, started, chunk_sizes)
+
+            # Drop our references first: items may be views into a caller's shared memory
+            items = chunk = None
+            for pending in batch:
+                pending.items = pending.trace = None
+                pending.done.set()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        uptime = time.monotonic() - self.started
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "pending": self.pending(),
+            "requests": self.requests,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+            "max_batch_size": self.max_batch_seen,
+            "batch_size_histogram": {f"le_{k}": v for k, v in sorted(self.size_histogram.items())},
+            "avg_queue_wait_ms": round(self.wait_seconds / self.requests * 1000, 2) if self.requests else 0,
+            "max_queue_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            "utilization": round(self.busy_seconds / uptime, 4) if uptime > 0 else 0,
+        }
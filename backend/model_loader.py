@@ -32,9 +32,23 @@ class DeepFakeModel(nn.Module):
         
         # Reshape for frame-level CNN
         x = x.view(batch_size * seq_len, C, H, W)
-        features = self.cnn(x)
+        features = self.extract_features(x)
         features = features.view(batch_size, seq_len, -1)
         
+        return self.classify_features(features)
+
+    def extract_features(self, x):
+        """
+        x: [num_images, 3, H, W] -> [num_images, cnn_out_features]
+        Split out of forward() so callers can run the CNN once per face crop and
+        reuse the features across overlapping sequences.
+        """
+        return self.cnn(x)
+
+    def classify_features(self, features):
+        """
+        features: [batch_size, seq_len, cnn_out_features] -> logits [batch_size, num_classes]
+        """
         # LSTM for temporal modeling
         lstm_out, _ = self.lstm(features)
         lstm_out = lstm_out[:, -1, :]  # Take last time step
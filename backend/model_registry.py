@@ -0,0 +1,66 @@
+import time
+import threading
+
+
+class ModelRegistry:
+    """
+    Loads each engine the first time it is needed (or from a background
+    warm-up thread) instead of at import time, and tracks per-engine
+    readiness for /health.
+
+    A loader is a zero-argument callable returning the ready engine object.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._engines = {}
+        self._state = {}
+        self._locks = {}
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+        self._state[name] = {"state": "not_loaded", "load_seconds": None, "error": None}
+
+    def get(self, name):
+        if name in self._engines:
+            return self._engines[name]
+
+        with self._locks[name]:
+            # Another thread may have finished loading while we waited
+            if name in self._engines:
+                return self._engines[name]
+
+            self._state[name].update(state="loading", error=None)
+            print(f"[Registry] Loading engine '{name}'...")
+            start = time.time()
+            try:
+                engine = self._loaders[name]()
+            except Exception as e:
+                self._state[name].update(state="failed", error=str(e))
+                print(f"[Registry] Engine '{name}' failed to load: {e}")
+                raise
+
+            self._engines[name] = engine
+            self._state[name].update(state="ready", load_seconds=round(time.time() - start, 2))
+            print(f"[Registry] Engine '{name}' ready in {self._state[name]['load_seconds']}s.")
+            return engine
+
+    def warm_up(self, names=None):
+        """Loads engines in a daemon thread so the server can answer immediately."""
+        def load_all():
+            for name in names or list(self._loaders):
+                try:
+                    self.get(name)
+                except Exception:
+                    pass  # Recorded in status(); retried on first real use
+
+        thread = threading.Thread(target=load_all, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def is_ready(self, name):
+        return name in self._engines
+
+    def status(self):
+        return {name: dict(state) for name, state in self._state.items()}
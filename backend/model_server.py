@@ -0,0 +1,218 @@
+"""
+Shared model server: one process per node holds the local engines (ResNet18
+heatmap, ViT neural core, EfficientNet+LSTM detector) and serves every
+FastAPI worker, so `uvicorn main:app --workers N` doesn't load them N times.
+
+    export TRUTHLENS_MODEL_SERVER_AUTHKEY=$(python -c "import secrets; print(secrets.token_hex(32))")
+    python model_server.py                      # listens on TRUTHLENS_MODEL_SERVER
+    TRUTHLENS_MODEL_SERVER=127.0.0.1:6001 uvicorn main:app --workers 4
+
+Requests are pickled, so the connection is authenticated with
+TRUTHLENS_MODEL_SERVER_AUTHKEY (shared by the server and every worker);
+neither side starts without it.
+
+Frames travel through shared memory (one memcpy in the worker, read in place
+by the server, never pickled); only small results go back over the socket.
+Requests from all workers are merged into shared forward passes by the
+engines' micro-batchers.
+"""
+import os
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+from config import MODEL_SERVER_ADDRESS, MODEL_SERVER_AUTHKEY
+
+DEFAULT_ADDRESS = "127.0.0.1:6001"
+
+
+def require_authkey(authkey):
+    """Pickled requests run code on unpickling: never talk over an unauthenticated connection."""
+    if not authkey:
+        raise ValueError("TRUTHLENS_MODEL_SERVER_AUTHKEY must be set to use the model server.")
+    return authkey
+
+
+def parse_address(address):
+    """"host:port" -> TCP tuple; anything else is a Unix socket path / Windows pipe name."""
+    host, sep, port = address.rpartition(":")
+    if sep and host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+# --- SHARED MEMORY FRAMES ---
+def _share(array):
+    """Copies an array into a fresh shared-memory block. Returns (block, spec to send)."""
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+    return block, {"shm": block.name, "shape": array.shape, "dtype": array.dtype.str}
+
+
+def _attach(spec):
+    """Maps a client's block without copying. The client owns it (and unlinks it)."""
+    try:
+        block = shared_memory.SharedMemory(name=spec["shm"], track=False)  # Python 3.13+
+    except TypeError:
+        block = shared_memory.SharedMemory(name=spec["shm"])
+        if os.name == "posix":
+            # Otherwise our resource tracker would unlink the client's block when we exit
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, "shared_memory")
+    return block, np.ndarray(spec["shape"], np.dtype(spec["dtype"]), buffer=block.buf)
+
+
+# --- SERVER ---
+class ModelServer:
+    def __init__(self, address, authkey):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self._detector = None
+        self._detector_lock = threading.Lock()
+
+    def load(self):
+        import heatmap_engine
+        import local_engine1
+        if heatmap_engine.load_model() is None:
+            print("[Model Server] WARNING: ResNet18 could not be loaded.")
+        if local_engine1.load_classifier() is None:
+            print("[Model Server] WARNING: Neural classifier could not be loaded.")
+
+    # Both go through the engines' micro-batchers, so frames from every
+    # worker are merged into shared forward passes
+    @staticmethod
+    def _heatmaps(array):
+        import torch
+        import heatmap_engine
+        return heatmap_engine.compute_heatmaps(torch.from_numpy(array))
+
+    @staticmethod
+    def _classify(array):
+        import local_engine1
+        return local_engine1.classify_rgb(list(array))
+
+    def _local_detect(self, video_path, kwargs):
+        # Whole-video op (MTCNN batches are per video); one at a time on the shared detector
+        with self._detector_lock:
+            if self._detector is None:
+                from local_engine import LocalDeepfakeDetector
+                self._detector = LocalDeepfakeDetector()
+            return self._detector.detect(video_path, **kwargs)
+
+    def _with_frames(self, spec, fn):
+        block, array = _attach(spec)
+        try:
+            return fn(array)
+        finally:
+            del array
+            block.close()
+
+    def dispatch(self, op, payload):
+        if op == "ping":
+            import heatmap_engine
+            import local_engine1
+            return {
+                "heatmap": heatmap_engine.model is not None,
+                "neural": local_engine1.classifier is not None,
+                "local": self._detector is not None,
+            }
+        if op == "heatmap":
+            return self._with_frames(payload, self._heatmaps)
+        if op == "neural":
+            return self._with_frames(payload, self._classify)
+        if op == "local":
+            return self._local_detect(payload["video_path"], payload.get("kwargs", {}))
+        raise ValueError(f"Unknown op '{op}'")
+
+    def _serve(self, conn):
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.dispatch(op, payload))
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def serve_forever(self):
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"[Model Server] Listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    print(f"[Model Server] Rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._serve, args=(conn,), name="model-conn", daemon=True).start()
+
+
+# --- CLIENT (used by FastAPI workers) ---
+class ModelClient:
+    """
+    Worker-side handle to the model server. Connections are not thread-safe,
+    so each thread (engine pool / pipeline thread) gets its own.
+    """
+
+    def __init__(self, address, authkey):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _call(self, op, payload=None):
+        try:
+            conn = self._conn()
+            conn.send((op, payload))
+            status, result = conn.recv()
+        except (EOFError, OSError) as e:
+            self._local.conn = None
+            raise ConnectionError(f"Model server at {self.address} unavailable: {e}")
+        if status == "error":
+            raise RuntimeError(f"Model server: {result}")
+        return result
+
+    def _call_with_frames(self, op, array):
+        block, spec = _share(array)
+        try:
+            return self._call(op, spec)
+        finally:
+            block.close()
+            block.unlink()
+
+    def ping(self):
+        return self._call("ping")
+
+    def heatmaps(self, input_batch):
+        """[N, 3, 224, 224] float32 (preprocessed) -> [N, 7, 7] normalized Grad-CAM heatmaps."""
+        return self._call_with_frames("heatmap", input_batch)
+
+    def classify(self, rgb_frames):
+        """Same-sized RGB uint8 frames -> FAKE risk score (0-100) per frame."""
+        return self._call_with_frames("neural", np.stack(rgb_frames))
+
+    def detect(self, video_path, **kwargs):
+        """LocalDeepfakeDetector.detect() on the server (the video must be readable there)."""
+        return self._call("local", {"video_path": os.path.abspath(video_path), "kwargs": kwargs})
+
+
+if __name__ == "__main__":
+    if not MODEL_SERVER_AUTHKEY:
+        raise SystemExit("[Model Server] Refusing to start: set TRUTHLENS_MODEL_SERVER_AUTHKEY to a random secret.")
+    server = ModelServer(MODEL_SERVER_ADDRESS or DEFAULT_ADDRESS, MODEL_SERVER_AUTHKEY)
+    server.load()
+    server.serve_forever()
@@ -0,0 +1,145 @@
+import os
+import re
+import time
+import uuid
+import asyncio
+
+from fastapi.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException
+
+PARTIAL_MARKER = ".partial"
+# Outputs this app writes (heatmap_<16 hex>[.<8 hex>.partial].<ext>); anything else in
+# generated/ (e.g. the bundled demo video) is never swept or counted
+MANAGED_NAME = re.compile(r"^heatmap_[0-9a-f]{16}(\.[0-9a-f]{8}\.partial)?\.\w+$")
+
+
+def partial_path(final_path):
+    """
+    A private, unique path to write `final_path` into before renaming it in place.
+    The extension stays last so OpenCV/FFmpeg still picks the right container.
+    """
+    stem, extension = os.path.splitext(final_path)
+    return f"{stem}.{uuid.uuid4().hex[:8]}{PARTIAL_MARKER}{extension}"
+
+
+def is_partial(path):
+    return PARTIAL_MARKER in os.path.basename(path)
+
+
+def commit(partial, final_path):
+    """Atomically publishes a finished file (readers see the old file or the new one, never half)."""
+    os.replace(partial, final_path)
+    return final_path
+
+
+def discard(partial):
+    try:
+        os.remove(partial)
+    except OSError:
+        pass
+
+
+class OutputJanitor:
+    """
+    Keeps the generated/ directory bounded: files older than `max_age` seconds
+    are removed, then the oldest files go until the total fits `max_bytes`.
+    Partial files are only swept once they are clearly abandoned (older than
+    `partial_grace` seconds), so in-flight encodes are never touched.
+    Only files whose name matches `managed` are looked at.
+    """
+
+    def __init__(self, directory, max_age, max_bytes, interval=600, partial_grace=3600, managed=MANAGED_NAME):
+        self.directory = directory
+        self.managed = managed
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.partial_grace = partial_grace
+        self.last_sweep = None
+        self.evicted = 0
+        self._task = None
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            self.evicted += 1
+            return True
+        except OSError:
+            return False
+
+    def _managed_files(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [e for e in os.scandir(self.directory) if e.is_file() and self.managed.match(e.name)]
+
+    def sweep(self):
+        now = time.time()
+        files = []
+        for entry in self._managed_files():
+            stat = entry.stat()
+            age = now - stat.st_mtime
+            if is_partial(entry.name):
+                if age > self.partial_grace:
+                    self._remove(entry.path)
+                continue
+            if age > self.max_age:
+                self._remove(entry.path)
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        # Over budget: evict oldest first
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if self._remove(path):
+                total -= size
+
+        self.last_sweep = now
+        return total
+
+    def start(self):
+        """Sweeps every `interval` seconds on the running event loop (work itself runs in a thread)."""
+        async def loop():
+            while True:
+                try:
+                    await asyncio.to_thread(self.sweep)
+                except Exception as e:
+                    print(f"[Janitor] Sweep failed: {e}")
+                await asyncio.sleep(self.interval)
+
+        self._task = asyncio.create_task(loop())
+        print(f"[Janitor] Watching '{self.directory}' (max age {self.max_age}s, max {self.max_bytes // (1024 * 1024)}MB).")
+        return self._task
+
+    def stats(self):
+        files = self._managed_files()
+        return {
+            "files": len(files),
+            "bytes": sum(e.stat().st_size for e in files),
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+            "last_sweep": self.last_sweep
+        }
+
+
+class OutputFiles(StaticFiles):
+    """
+    StaticFiles for generated outputs. Range requests (video seeking) and
+    ETag / Last-Modified revalidation come from Starlette's FileResponse;
+    this adds Cache-Control and hides files that are still being written.
+    """
+
+    def __init__(self, *args, max_age=3600, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+
+    async def get_response(self, path, scope):
+        if is_partial(path):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = f"public, max-age={self.max_age}"
+        return response
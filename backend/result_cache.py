@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Two-tier verdict cache keyed by upload content hash + mode + model version.
+      Tier 1: bounded in-memory LRU (OrderedDict).
+      Tier 2: one JSON file per key on disk, with TTL and a total-size budget.
+    Entries that reference a heatmap video are only served while that file
+    still exists, so a cleaned-up video never yields a dead video_url.
+    """
+
+    def __init__(self, cache_dir, model_version, memory_entries=256,
+                 ttl_seconds=7 * 24 * 3600, max_disk_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.model_version = model_version
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, content_digest, mode):
+        raw = f"{content_digest}|{mode}|{self.model_version}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _is_valid(self, entry):
+        if time.time() - entry["created"] > self.ttl_seconds:
+            return False
+        video_file = entry.get("video_file")
+        return not video_file or os.path.exists(video_file)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._is_valid(entry):
+                    self._memory.move_to_end(key)
+                    self.hits_memory += 1
+                    return entry["result"]
+                del self._memory[key]
+
+            entry = self._read_disk(key)
+            if entry is not None and self._is_valid(entry):
+                self._remember(key, entry)
+                self.hits_disk += 1
+                return entry["result"]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, result, video_file=None):
+        entry = {"created": time.time(), "result": result, "video_file": video_file}
+        with self._lock:
+            self._remember(key, entry)
+            try:
+                tmp_path = self._path(key) + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                os.replace(tmp_path, self._path(key))
+            except Exception as e:
+                print(f"[Cache] Failed to persist entry: {e}")
+            self._evict_disk()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _evict_disk(self):
+        """Drops expired entries, then the oldest ones until under max_disk_bytes."""
+        now = time.time()
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                self._remove(path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits_memory + self.hits_disk + self.misses
+            return {
+                "hits": self.hits_memory + self.hits_disk,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
@@ -0,0 +1,161 @@
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from config import PIPELINE_WORKERS, PIPELINE_QUEUE_SIZE
+from telemetry import StageTimer
+
+_DONE = object()
+_POLL = 0.1  # Seconds between stop checks while blocked on a full/empty queue
+
+
+def _put(q, item, stop):
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+class StreamPipeline:
+    """
+    Overlaps the stages of a video engine instead of running them in strict
+    sequence on one thread:
+
+        decoder thread -> preprocess pool -> inference (caller) -> writer thread
+
+    preprocess(frame) -> item         runs on `workers` threads (color/resize/tensor)
+    infer([item, ...]) -> [result]    runs on the calling thread, `batch_size` items at a time
+    write(frame, result)              runs on its own thread (overlay/encode), optional
+
+    Stages are joined by bounded queues, so a slow stage blocks the ones
+    upstream (backpressure) and at most ~2 * queue_size frames are in flight.
+    Results come back from run() in frame order. The first exception raised in
+    any stage stops the others and is re-raised from run().
+    """
+
+    def __init__(self, preprocess=None, infer=None, write=None, batch_size=8,
+                 workers=PIPELINE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, name="pipeline"):
+        self.preprocess = preprocess
+        self.infer = infer
+        self.write = write
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.name = name
+
+    def _timed(self, fn, timer):
+        def timed(*args):
+            with timer.measure():
+                return fn(*args)
+        return timed
+
+    def run(self, frames, progress=None, total=None, until=None):
+        """
+        frames: any iterable of frames (a decoding generator or a pre-decoded list).
+        progress: optional callback(done, total) called after every batch.
+        until: optional callback(batch_results) -> bool called after every batch;
+        True stops decoding there (early stopping). Frames already inferred are
+        still written, and run() returns the results so far.
+
+        Time spent in each stage is recorded as a telemetry span (engine = name).
+        Stage threads run in copies of the caller's context, so spans recorded
+        inside preprocess/write also land in the caller's request trace.
+        """
+        timers = {stage: StageTimer(stage, self.name) for stage in ("decode", "preprocess", "infer", "write")}
+        preprocess = self._timed(self.preprocess, timers["preprocess"]) if self.preprocess else None
+        infer = self._timed(self.infer, timers["infer"])
+        write_frame = self._timed(self.write, timers["write"]) if self.write else None
+        stop = threading.Event()
+        errors = []
+        prepared = queue.Queue(maxsize=self.queue_size)  # (frame, future) in frame order
+        finished = queue.Queue(maxsize=self.queue_size)  # (frame, result) for the writer
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"{self.name}-prep")
+
+        def decode():
+            try:
+                frame_iter = iter(frames)
+                while True:
+                    with timers["decode"].measure():
+                        frame = next(frame_iter, _DONE)
+                    if frame is _DONE or stop.is_set():
+                        return
+                    future = pool.submit(contextvars.copy_context().run, preprocess, frame) if preprocess else None
+                    if not _put(prepared, (frame, future), stop):
+                        return
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                _put(prepared, _DONE, stop)
+
+        def write():
+            try:
+                while True:
+                    item = _get(finished, stop)
+                    if item is _DONE:
+                        return
+                    write_frame(*item)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+
+        decoder = threading.Thread(target=contextvars.copy_context().run, args=(decode,),
+                                   name=f"{self.name}-decode", daemon=True)
+        writer = threading.Thread(target=contextvars.copy_context().run, args=(write,),
+                                  name=f"{self.name}-write", daemon=True) if self.write else None
+        decoder.start()
+        if writer:
+            writer.start()
+
+        results = []
+        try:
+            batch = []
+            while True:
+                item = _get(prepared, stop)
+                if item is not _DONE:
+                    frame, future = item
+                    batch.append((frame, future.result() if future else frame))
+                if batch and (len(batch) == self.batch_size or item is _DONE):
+                    if stop.is_set():
+                        break
+                    batch_results = list(infer([prepped for _, prepped in batch]))
+                    results.extend(batch_results)
+                    if writer:
+                        for (frame, _), result in zip(batch, batch_results):
+                            _put(finished, (frame, result), stop)
+                    batch = []
+                    if progress:
+                        progress(len(results), total or len(results))
+                    if until and until(batch_results):
+                        break
+                if item is _DONE:
+                    break
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            if writer:
+                _put(finished, _DONE, stop)
+                writer.join()
+            stop.set()  # Unblocks the decoder if we bailed out early
+            decoder.join()
+            pool.shutdown(wait=True, cancel_futures=True)
+            for timer in timers.values():
+                timer.record()
+
+        if errors:
+            raise errors[0]
+        return results
@@ -0,0 +1,178 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds. Covers per-frame work (ms) up to whole Gemini round trips (minutes).
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_current = contextvars.ContextVar("truthlens_trace", default=None)
+
+
+# --- PER-REQUEST TRACES ---
+class Trace:
+    """Stage timings of one request, summed per (engine, stage)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, engine, seconds, count=1):
+        with self._lock:
+            entry = self.stages.setdefault((engine, stage), [0.0, 0])
+            entry[0] += seconds
+            entry[1] += count
+
+    def breakdown(self):
+        """{"total_ms", "stages": {engine: {stage: {"ms", "count"}}}} for API responses."""
+        stages = {}
+        with self._lock:
+            for (engine, stage), (seconds, count) in sorted(self.stages.items()):
+                stages.setdefault(engine, {})[stage] = {"ms": round(seconds * 1000, 1), "count": count}
+        return {"total_ms": round((time.perf_counter() - self.started) * 1000, 1), "stages": stages}
+
+
+class _TraceGroup:
+    """Fans one span out to several requests (work shared by a micro-batch)."""
+
+    def __init__(self, traces):
+        self.traces = traces
+
+    def add(self, stage, engine, seconds, count=1):
+        for trace in self.traces:
+            trace.add(stage, engine, seconds, count)
+
+
+@contextmanager
+def trace_request():
+    """Collects every span recorded in this context (and copies of it) into a new Trace."""
+    trace = Trace()
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def use_traces(traces):
+    """Attributes spans in this block to all `traces` (e.g. every request in a batch)."""
+    traces = [t for t in traces if t is not None]
+    token = _current.set(_TraceGroup(traces) if traces else None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+# --- SPANS ---
+def record(stage, engine, seconds, count=1):
+    """One observation for the /metrics histogram, plus the current request's trace."""
+    STAGE_SECONDS.observe(seconds, stage=stage, engine=engine)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(stage, engine, seconds, count)
+
+
+@contextmanager
+def span(stage, engine="request"):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, engine, time.perf_counter() - start)
+
+
+class StageTimer:
+    """
+    Sums a stage that happens many times per request (per frame, on any
+    thread) and records it once, as a single span, when record() is called.
+    """
+
+    def __init__(self, stage, engine):
+        self.stage = stage
+        self.engine = engine
+        self.seconds = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.seconds += elapsed
+                self.count += 1
+
+    def record(self):
+        if self.count:
+            record(self.stage, self.engine, self.seconds, self.count)
+
+
+# --- PROMETHEUS EXPORT ---
+class Histogram:
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = ",".join(f'{k}="{v}"' for k, v in key)
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+                lines.append(f"{self.name}_sum{{{labels}}} {series['sum']:.6f}")
+                lines.append(f"{self.name}_count{{{labels}}} {series['count']}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("truthlens_stage_seconds", "Time spent per pipeline stage, per engine.")
+
+
+def render_metrics(batchers=None):
+    """Prometheus text exposition of the stage histograms (and micro-batcher counters)."""
+    lines = STAGE_SECONDS.render()
+    if batchers:
+        counters = [
+            ("truthlens_batch_requests_total", "counter", "Requests submitted to the micro-batcher.", "requests"),
+            ("truthlens_batch_passes_total", "counter", "Forward passes run by the micro-batcher.", "batches"),
+            ("truthlens_batch_items_total", "counter", "Items processed by the micro-batcher.", "items"),
+            ("truthlens_batch_queue_wait_seconds_total", "counter", "Summed queue wait of batched requests.", "wait_seconds"),
+            ("truthlens_batch_busy_seconds_total", "counter", "Time the micro-batcher spent in the model.", "busy_seconds"),
+            ("truthlens_batch_pending", "gauge", "Requests waiting for a batch.", None),
+        ]
+        for metric, kind, help_text, attribute in counters:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, batcher in sorted(batchers.items()):
+                value = getattr(batcher, attribute) if attribute else batcher.pending()
+                lines.append(f'{metric}{{model="{name}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -8,14 +8,13 @@ sys.path.append(os.getcwd())
 
 from local_engine import LocalDeepfakeDetector
 
-def test_inference():
+def test_inference(video_paths=()):
     print("--- QA TEST 2: INFERENCE PIPELINE ---")
-    
-    video_paths = [
-        r"C:\Users\Parshva Shah\Downloads\Ai Video Kaise Banaye  Al Video Generator Free  Ai Video Generator  Image to Video Generator Free - DM Editor (1080p, h264, youtube).mp4",
-        r"C:\Users\Parshva Shah\Downloads\AI generated video #vlogs #funny #veo3 #comedy #AI - Fact Prime Time (720p, h264, youtube).mp4",
-        r"C:\Users\Parshva Shah\Downloads\How to make AI video for free  Free Ai video generator # #videoediting #shorts #ai #viral #explore - Ai.babyvideos (720p, h264, youtube).mp4"
-    ]
+
+    if not video_paths:
+        print("Usage: python test_inference.py VIDEO [VIDEO ...]")
+        print("(No test videos at hand? benchmark_suite.py generates synthetic ones in bench_videos/.)")
+        return
 
     # Initialize Detector
     try:
@@ -30,15 +29,15 @@ def test_inference():
 
     # Run Inference
     for i, path in enumerate(video_paths):
-        print(f"\n[{i+1}/3] Testing Video: {os.path.basename(path)}")
+        print(f"\n[{i+1}/{len(video_paths)}] Testing Video: {os.path.basename(path)}")
         if not os.path.exists(path):
             print(f"    [WARN] File not found: {path}")
             continue
             
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
             result = detector.detect(path)
-            duration = time.time() - start_time
+            duration = time.perf_counter() - start_time
             
             print(f"    Verdict:    {result.get('verdict')}")
             print(f"    Confidence: {result.get('confidence')}%")
@@ -58,4 +57,4 @@ def test_inference():
             traceback.print_exc()
 
 if __name__ == "__main__":
-    test_inference()
+    test_inference(sys.argv[1:])
@@ -0,0 +1,282 @@
+import io
+import os
+import hashlib
+import tempfile
+import threading
+
+from fastapi import HTTPException
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+SNIFF_BYTES = 512   # Enough for every signature below (MPEG-TS needs 189)
+
+# Default extension per container, so OpenCV/FFmpeg and Gemini get a sane name
+CONTAINER_EXTENSIONS = {
+    "mp4": ".mp4",
+    "matroska": ".mkv",
+    "avi": ".avi",
+    "mpeg-ts": ".ts",
+    "mpeg-ps": ".mpg",
+    "flv": ".flv",
+    "asf": ".wmv",
+    "ogg": ".ogv",
+}
+
+
+def sniff_container(head):
+    """Identifies the video container from the first bytes of a file, or None."""
+    if len(head) >= 12 and head[4:8] in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+        return "mp4"  # ISO-BMFF: MP4 / MOV / M4V / 3GP
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "matroska"  # MKV / WebM
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "avi"
+    if len(head) > 188 and head[0] == 0x47 and head[188] == 0x47:
+        return "mpeg-ts"
+    if head[:4] == b"\x00\x00\x01\xba":
+        return "mpeg-ps"
+    if head[:3] == b"FLV":
+        return "flv"
+    if head[:8] == b"\x30\x26\xb2\x75\x8e\x66\xcf\x11":
+        return "asf"
+    if head[:4] == b"OggS":
+        return "ogg"
+    return None
+
+
+class SpooledUpload:
+    """
+    An upload received in chunks. Small files stay in memory; once `max_memory`
+    is exceeded the data spills to a uniquely named file in `scratch_dir`.
+    `path` gives engines a real file (materialising in-memory data only if an
+    engine actually needs one - a cache hit never touches the disk).
+    Engine threads that may outlive the request (timed out / cancelled) are
+    retain()'ed: close() then only deletes the file once the last one exits.
+    """
+
+    def __init__(self, filename, scratch_dir, max_memory):
+        self.filename = filename
+        self.scratch_dir = scratch_dir
+        self.max_memory = max_memory
+        self.container = None
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._path = None
+        self._workers = set()
+        self._closing = False
+        self._lock = threading.Lock()
+
+    @property
+    def digest(self):
+        return self._hash.hexdigest()
+
+    @property
+    def in_memory(self):
+        return self._path is None
+
+    def _suffix(self):
+        extension = os.path.splitext(self.filename or "")[1].lower()
+        if extension.isascii() and 1 < len(extension) <= 6 and extension[1:].isalnum():
+            return extension
+        return CONTAINER_EXTENSIONS.get(self.container, ".bin")
+
+    def _spill(self):
+        os.makedirs(self.scratch_dir, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(
+            dir=self.scratch_dir, prefix="upload_", suffix=self._suffix(), delete=False
+        )
+        self._path = self._file.name
+        self._file.write(self._buffer.getvalue())
+        self._buffer = None
+
+    def write(self, chunk):
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        if self._file is None and self.size > self.max_memory:
+            self._spill()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._spill()
+            self.finish()
+        return self._path
+
+    def retain(self, future):
+        """Keeps the file until `future` (a concurrent.futures.Future reading it) is done."""
+        with self._lock:
+            self._workers.add(future)
+        future.add_done_callback(self._release)
+
+    def _release(self, future):
+        with self._lock:
+            self._workers.discard(future)
+            if not self._closing or self._workers:
+                return
+        self._close_now()
+
+    def close(self):
+        with self._lock:
+            self._closing = True
+            if self._workers:
+                print(f"[Upload] {len(self._workers)} engine(s) still reading {self.filename}; deleting it once they exit.")
+                return
+        self._close_now()
+
+    def _close_now(self):
+        self.finish()
+        if self._path and os.path.exists(self._path):
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+        self._path = None
+        self._buffer = None
+
+
+_FILE_PART = object()  # Marks the current part as the upload (a field may be called "file" too)
+
+
+class _FormReceiver:
+    """
+    python-multipart callbacks for one multipart/form-data body: the file
+    part goes straight into a SpooledUpload (sniffed on its first bytes),
+    every other part is collected as a (small) text field.
+    """
+
+    def __init__(self, file_field, scratch_dir, max_memory, max_field_bytes):
+        self.file_field = file_field
+        self.scratch_dir = scratch_dir
+        self.max_memory = max_memory
+        self.max_field_bytes = max_field_bytes
+        self.upload = None
+        self.fields = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._part = None     # _FILE_PART / field name of the current part
+        self._head = b""      # File bytes held back until the container is known
+        self._value = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": lambda data, start, end: self._append("_header_field", data[start:end]),
+            "on_header_value": lambda data, start, end: self._append("_header_value", data[start:end]),
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def _append(self, attribute, data):
+        setattr(self, attribute, getattr(self, attribute) + data)
+
+    def on_part_begin(self):
+        self._disposition = b""
+        self._part = None
+        self._value = b""
+
+    def on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if name == self.file_field:
+            if self.upload is not None:
+                raise HTTPException(status_code=400, detail=f"More than one '{self.file_field}' part.")
+            filename = options.get(b"filename", b"").decode("utf-8", "replace")
+            self.upload = SpooledUpload(os.path.basename(filename), self.scratch_dir, self.max_memory)
+            self._part = _FILE_PART
+        else:
+            self._part = name
+
+    def on_part_data(self, data, start, end):
+        chunk = data[start:end]
+        if self._part is not _FILE_PART:
+            self._value += chunk
+            if len(self._value) > self.max_field_bytes:
+                raise HTTPException(status_code=413, detail=f"Form field '{self._part}' is too large.")
+            return
+
+        if self.upload.container is None:
+            self._head += chunk
+            if len(self._head) < SNIFF_BYTES:
+                return
+            _check_container(self.upload, self._head)
+            chunk, self._head = self._head, b""
+        self.upload.write(chunk)
+
+    def on_part_end(self):
+        if self._part is _FILE_PART:
+            if self.upload.container is None:
+                # Whole file was shorter than SNIFF_BYTES
+                _check_container(self.upload, self._head)
+                self.upload.write(self._head)
+                self._head = b""
+            self.upload.finish()
+        elif self._part:
+            self.fields[self._part] = self._value.decode("utf-8", "replace")
+        self._part = None
+
+
+async def receive_form(request, scratch_dir, max_memory, file_field="file", max_field_bytes=64 * 1024):
+    """
+    Parses a multipart/form-data request AS THE BODY ARRIVES (request.stream(),
+    not a pre-parsed UploadFile). The `file_field` part is hashed, sniffed and
+    spooled chunk by chunk, so anything that is not a video is rejected (HTTP
+    415) after its first bytes, before the rest of the body is even read.
+    Returns (SpooledUpload, {field: value} for the other form fields).
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload.")
+
+    receiver = _FormReceiver(file_field, scratch_dir, max_memory, max_field_bytes)
+    parser = MultipartParser(options[b"boundary"], receiver.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+        if receiver.upload is None or receiver.upload.container is None:
+            raise HTTPException(status_code=422, detail=f"Missing '{file_field}' upload.")
+        return receiver.upload, receiver.fields
+    except BaseException:
+        if receiver.upload is not None:
+            receiver.upload.close()
+        raise
+
+
+def form_flag(fields, name, default=False):
+    """Boolean form field ("true" / "1" / "yes" / "on"), `default` when absent."""
+    value = fields.get(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _check_container(upload, head):
+    upload.container = sniff_container(head)
+    if upload.container is None:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported upload '{upload.filename}': not a recognised video container."
+        )
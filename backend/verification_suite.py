@@ -22,17 +22,18 @@ def test_connectivity():
 def test_local_engine():
     print("\nTesting Local Engine (Mock Upload)...")
     # multiple chunk upload mock
-    with open("requirements.txt", "rb") as f: # Use dummy file
+    with open("requirements.txt", "rb") as f: # Use dummy file (not a real video)
         files = {"file": ("test_video.mp4", f, "video/mp4")}
         data = {"mode": "local"}
         try:
             resp = requests.post(f"{BASE_URL}/analyze", files=files, data=data)
             print(f"Response: {resp.status_code}")
-            if resp.status_code == 200:
+            if resp.status_code == 415:
+                # The backend sniffs the container while streaming and must reject non-videos
                 print(f"JSON: {resp.json()}")
-                print("[OK] Local Engine API OK")
+                print("[OK] Local Engine API OK (non-video upload rejected)")
             else:
-                print(f"[FAIL] Local Engine Failed: {resp.text}")
+                print(f"[FAIL] Local Engine accepted a non-video upload: {resp.text}")
         except Exception as e:
             print(f"[FAIL] Local Engine Error: {e}")
 
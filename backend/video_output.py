@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import threading
+
+import cv2
+import numpy as np
+
+from output_store import partial_path, commit, discard
+
+# Browser-friendly codecs first. MP4V is often blocked by Chrome/Edge, so it is the last resort.
+CODEC_PREFERENCE = ["avc1", "vp09", "mp4v"]
+CODEC_EXTENSIONS = {"avc1": ".mp4", "vp09": ".webm", "mp4v": ".mp4"}
+
+_available_codecs = None
+_probe_lock = threading.Lock()
+
+
+def probe_codecs(force=False):
+    """
+    Finds out which VideoWriter codecs actually work on this machine by writing
+    a tiny clip with each one. Runs once per process (call it at startup);
+    later calls return the cached list in preference order.
+    """
+    global _available_codecs
+    with _probe_lock:
+        if _available_codecs is not None and not force:
+            return _available_codecs
+
+        probe_dir = tempfile.mkdtemp(prefix="codec_probe_")
+        frame = np.zeros((64, 64, 3), dtype=np.uint8)
+        available = []
+        try:
+            for codec in CODEC_PREFERENCE:
+                path = os.path.join(probe_dir, f"probe_{codec}{CODEC_EXTENSIONS[codec]}")
+                writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), 10.0, (64, 64))
+                if writer.isOpened():
+                    for _ in range(3):
+                        writer.write(frame)
+                writer.release()
+                if os.path.exists(path) and os.path.getsize(path) > 0:
+                    available.append(codec)
+        finally:
+            shutil.rmtree(probe_dir, ignore_errors=True)
+
+        print(f"[Video Output] Usable codecs: {available or 'none'}")
+        _available_codecs = available
+        return available
+
+
+def pick_codec(preferred="auto"):
+    """The requested codec if it works here, else the best available one (or None)."""
+    available = probe_codecs()
+    if preferred != "auto" and preferred in available:
+        return preferred
+    if preferred != "auto":
+        print(f"[Video Output] Codec '{preferred}' unavailable, falling back to {available[:1]}")
+    return available[0] if available else None
+
+
+def output_size(width, height, max_side=0):
+    """Scales (width, height) so the longest side is <= max_side (0 = keep). Even dimensions for the encoders."""
+    scale = 1.0
+    if max_side and max(width, height) > max_side:
+        scale = max_side / max(width, height)
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+
+def frame_stride(source_fps, output_fps=0):
+    """Write every Nth frame so the output runs at roughly `output_fps` (0 = every frame)."""
+    if not output_fps or not source_fps or output_fps >= source_fps:
+        return 1
+    return max(1, int(round(source_fps / output_fps)))
+
+
+class VideoOutput:
+    """
+    A VideoWriter configured from an output profile {"max_side", "fps", "codec"}.
+    Frames passed to write() must be at `size` (the profile's max side); only
+    every `stride`-th one is encoded, so the output fps follows the profile too.
+    """
+
+    def __init__(self, output_dir, stem, width, height, source_fps, profile):
+        self.codec = pick_codec(profile.get("codec", "auto"))
+        if self.codec is None:
+            raise RuntimeError("No usable video codec found for the heatmap output.")
+
+        self.size = output_size(width, height, profile.get("max_side", 0))
+        self.stride = frame_stride(source_fps, profile.get("fps", 0))
+        self.fps = (source_fps or 30.0) / self.stride
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, stem + CODEC_EXTENSIONS[self.codec])
+        # Encode into a private partial file; release() renames it into place atomically
+        self._partial = partial_path(self.path)
+        self._writer = cv2.VideoWriter(self._partial, cv2.VideoWriter_fourcc(*self.codec), self.fps, self.size)
+        self._index = 0
+        print(f"[Video Output] {self.codec} {self.size[0]}x{self.size[1]} @ {self.fps:.1f}fps -> {self.path}")
+
+    def wants(self):
+        """True if the next frame will be encoded (lets callers skip overlay work for dropped frames)."""
+        return self._index % self.stride == 0
+
+    def write(self, frame):
+        """frame must already be at self.size (callers render overlays at output resolution)."""
+        if self.wants():
+            self._writer.write(frame)
+        self._index += 1
+
+    def skip(self):
+        self._index += 1
+
+    def release(self, keep=True):
+        """Finishes the file and publishes it at self.path (keep=False deletes it instead)."""
+        self._writer.release()
+        if keep:
+            commit(self._partial, self.path)
+        else:
+            discard(self._partial)
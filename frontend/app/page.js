@@ -4,6 +4,10 @@ import { motion, AnimatePresence } from "framer-motion";
 import { Upload, ShieldAlert, CheckCircle, Search, Activity, Cpu, Eye, Lock, ScanLine, AlertTriangle, Cloud, ShieldCheck } from "lucide-react";
 import TerminalLoader from "../components/TerminalLoader";
 
+// Engines the cascade skipped (or that never ran) come back with a null score
+const engineScoreLabel = (score) => (score == null ? "NOT RUN" : `${score}%`);
+const engineBarWidth = (score) => `${score ?? 0}%`;
+
 export default function Home() {
   const [file, setFile] = useState(null);
   const [uploading, setUploading] = useState(false);
@@ -11,6 +15,7 @@ export default function Home() {
   const [bootText, setBootText] = useState("INITIALIZING NEURAL CORE...");
   const [progress, setProgress] = useState(0);
   const [mode, setMode] = useState('cloud'); // 'cloud' or 'local'
+  const [engineStatus, setEngineStatus] = useState("");
 
   // --- BOOT SEQUENCE LOGIC ---
   const runBootSequence = () => {
@@ -28,16 +33,38 @@ export default function Home() {
       i++;
     }, 1200);
 
-    const progInterval = setInterval(() => {
-      setProgress((prev) => (prev >= 100 ? 100 : prev + 1.5));
-    }, 100);
-
     return () => {
       clearInterval(interval);
-      clearInterval(progInterval);
     };
   };
 
+  // --- JOB POLLING (Real progress from the backend job API) ---
+  const pollJob = async (API_BASE, jobId) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+
+      const response = await fetch(`${API_BASE}/jobs/${jobId}`, {
+        headers: {
+          "ngrok-skip-browser-warning": "69420",
+        },
+      });
+      const job = await response.json();
+      if (!response.ok) {
+        throw new Error(job.detail || "Job lookup failed");
+      }
+
+      setProgress(job.progress * 100);
+      setEngineStatus(
+        Object.entries(job.engines)
+          .map(([name, engine]) => `${name.toUpperCase()}:${engine.status.toUpperCase()}${engine.score != null ? `[${engine.score}%]` : ""}`)
+          .join(" // ")
+      );
+
+      if (job.status === "done") return job.result;
+      if (job.status === "failed") throw new Error(job.error || "Analysis failed");
+    }
+  };
+
   const handleFileChange = (e) => {
     if (e.target.files[0]) {
       setFile(e.target.files[0]);
@@ -51,6 +78,7 @@ export default function Home() {
 
     setUploading(true);
     setProgress(0);
+    setEngineStatus("");
     const stopBoot = runBootSequence();
 
     const API_BASE = process.env.NEXT_PUBLIC_API_URL || 'http://127.0.0.1:5000';
@@ -59,12 +87,8 @@ export default function Home() {
     formData.append("mode", mode);
 
     try {
-      // DYNAMIC ENDPOINT SELECTION
-      const endpoint = mode === 'master'
-        ? `${API_BASE}/analyze_ensemble`
-        : `${API_BASE}/analyze`;
-
-      const response = await fetch(endpoint, {
+      // SUBMIT AS A JOB (mode selects the engine(s), 'master' = ensemble)
+      const response = await fetch(`${API_BASE}/jobs`, {
         method: "POST",
         headers: {
           "ngrok-skip-browser-warning": "69420",
@@ -72,7 +96,12 @@ export default function Home() {
         body: formData,
       });
 
-      const data = await response.json();
+      const submitted = await response.json();
+      if (!response.ok) {
+        throw new Error(submitted.detail || "Job submission failed");
+      }
+
+      const data = await pollJob(API_BASE, submitted.job_id);
 
       // CACHE BUSTING: Append timestamp to force video reload
       if (data.video_url) {
@@ -257,10 +286,10 @@ export default function Home() {
             <div>
               <div className="flex justify-between text-xs mb-1 text-green-500/70">
                 <span>CLOUD INTELLIGENCE </span>
-                <span>{result.breakdown.api}%</span>
+                <span>{engineScoreLabel(result.breakdown.api)}</span>
               </div>
               <div className="w-full h-2 bg-gray-900 border border-green-500/30">
-                <div className="h-full bg-blue-500" style={{ width: `${result.breakdown.api}%` }}></div>
+                <div className="h-full bg-blue-500" style={{ width: engineBarWidth(result.breakdown.api) }}></div>
               </div>
             </div>
 
@@ -268,10 +297,10 @@ export default function Home() {
             <div>
               <div className="flex justify-between text-xs mb-1 text-green-500/70">
                 <span>VISUAL SPECTRUM </span>
-                <span>{result.breakdown.heatmap}%</span>
+                <span>{engineScoreLabel(result.breakdown.heatmap)}</span>
               </div>
               <div className="w-full h-2 bg-gray-900 border border-green-500/30">
-                <div className="h-full bg-orange-500" style={{ width: `${result.breakdown.heatmap}%` }}></div>
+                <div className="h-full bg-orange-500" style={{ width: engineBarWidth(result.breakdown.heatmap) }}></div>
               </div>
             </div>
 
@@ -279,10 +308,10 @@ export default function Home() {
             <div>
               <div className="flex justify-between text-xs mb-1 text-green-500/70">
                 <span>NEURAL PATTERNS </span>
-                <span>{result.breakdown.neural}%</span>
+                <span>{engineScoreLabel(result.breakdown.neural)}</span>
               </div>
               <div className="w-full h-2 bg-gray-900 border border-green-500/30">
-                <div className="h-full bg-purple-500" style={{ width: `${result.breakdown.neural}%` }}></div>
+                <div className="h-full bg-purple-500" style={{ width: engineBarWidth(result.breakdown.neural) }}></div>
               </div>
             </div>
           </div>
@@ -310,7 +339,7 @@ export default function Home() {
               <div className="absolute inset-0 bg-[repeating-linear-gradient(90deg,transparent,transparent_10px,#000_10px,#000_12px)] opacity-50 pointer-events-none"></div>
             </div>
             <div className="mt-2 text-green-500/60 text-[10px] tracking-[0.2em] blink">
-              ... DECRYPTING_VIDEO_STREAM ...
+              {engineStatus || "... DECRYPTING_VIDEO_STREAM ..."}
             </div>
           </div>
         </div>